@@ -1,16 +1,19 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+import heapq
+from solutionExtraction import selectedKeys
+from shortestPath import dijkstra
 
 
-def solveBiobjectiveSP(G: nx.DiGraph, source: int, sink: int, objVal) -> dict:
+def buildBiobjectiveSP(G: nx.DiGraph, source: int, sink: int, objVal):
     """
-    Computes a (weakly) non-dominated point of the biobjective shortest paths problem.
+    Builds the epsilon-constraint model of the biobjective shortest paths problem.
     :param G: directed graph
     :param source: Source node in G
     :param sink: Sink node in G
     :param objVal: Bound on second objective
-    :return: Dict with objective value and path
+    :return: Model, dict of edge variables and bound constraint on the second objective
     """
     BiobjSP = Model('BiobjSP')
 
@@ -35,20 +38,30 @@ def solveBiobjectiveSP(G: nx.DiGraph, source: int, sink: int, objVal) -> dict:
             BiobjSP.addConstr(quicksum(X[a] for a in G.out_edges(v)) - quicksum(X[a] for a in G.in_edges(v)),
                                   GRB.EQUAL, 0)
 
-    BiobjSP.addConstr(quicksum(X[u,v]*G[u][v]['length2'] for u,v in G.edges()), GRB.LESS_EQUAL, objVal - 1)
+    bound = BiobjSP.addConstr(quicksum(X[u,v]*G[u][v]['length2'] for u,v in G.edges()), GRB.LESS_EQUAL, objVal - 1)
 
-    # Solve model
     BiobjSP.update()
+    return BiobjSP, X, bound
+
+
+def solveBiobjectiveSP(G: nx.DiGraph, source: int, sink: int, objVal) -> dict:
+    """
+    Computes a (weakly) non-dominated point of the biobjective shortest paths problem.
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param objVal: Bound on second objective
+    :return: Dict with objective value and path
+    """
+    BiobjSP, X, bound = buildBiobjectiveSP(G, source, sink, objVal)
+
+    # Solve model
     BiobjSP.optimize()
 
     if BiobjSP.status == GRB.OPTIMAL:
         SP = dict()
-        SP['objVal'] = (BiobjSP.objVal, sum(BiobjSP.getVarByName(f'X_{u}_{v}').x * G[u][v]['length2']
-                                            for u,v in G.edges()))
-        SP['path'] = list()
-        for u,v in G.edges():
-            if round(BiobjSP.getVarByName(f'X_{u}_{v}').x, 0) == 1:
-                SP['path'].append((u,v))
+        SP['path'] = selectedKeys(BiobjSP, X)
+        SP['objVal'] = (BiobjSP.objVal, sum(G[u][v]['length2'] for u,v in SP['path']))
         return SP
 
     else:
@@ -76,6 +89,95 @@ def epsConstraint(G: nx.DiGraph, source: int, sink: int, objVal):
             return result
 
 
+def epsConstraintIncremental(G: nx.DiGraph, source: int, sink: int, objVal):
+    """
+    Solves the biobjective shortest paths problem by using the epsilon-constraint method on a single persistent
+    model and returns all (weakly) non-dominated points. Between iterations only the right-hand side of the bound
+    constraint is updated, the speedup comes from reusing the model (the previous path violates the tightened bound,
+    so it is no MIP start).
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param objVal: Initial bound on second objective
+    :return: List with objective values and paths
+    """
+    BiobjSP, X, bound = buildBiobjectiveSP(G, source, sink, objVal)
+    result = list()
+    while True:
+        BiobjSP.optimize()
+        if not BiobjSP.status == GRB.OPTIMAL:
+            return result
+
+        SP = dict()
+        SP['path'] = selectedKeys(BiobjSP, X)
+        SP['objVal'] = (BiobjSP.objVal, sum(G[u][v]['length2'] for u,v in SP['path']))
+        result.append(SP)
+
+        # Tighten the bound
+        bound.RHS = SP['objVal'][1] - 1
+
+
+def labelSetting(G: nx.DiGraph, source: int, sink: int) -> list:
+    """
+    Solves the biobjective shortest paths problem with a label-setting algorithm (BOA*) and returns all non-dominated
+    points. Labels are extracted in lexicographic order of their cost plus a lower bound on the remaining cost, so a
+    label is dominated if and only if its second cost does not improve on the best permanent label of its node.
+    Lengths must be nonnegative.
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :return: List with objective values and paths
+    """
+    # Lower bounds on the remaining costs to the sink
+    h1, _ = dijkstra(G, sink, weight='length1', reverse=True)
+    h2, _ = dijkstra(G, sink, weight='length2', reverse=True)
+    if source not in h1:
+        return list()
+
+    # Labels: costs, node and parent label
+    cost1 = [0]
+    cost2 = [0]
+    labelNode = [source]
+    parent = [-1]
+
+    # Second cost of the last permanent label of each node
+    minCost2 = dict()
+    heap = [(h1[source], h2[source], 0)]
+    result = list()
+
+    while heap:
+        _, _, label = heapq.heappop(heap)
+        u = labelNode[label]
+        if cost2[label] >= minCost2.get(u, float('inf')) or \
+                cost2[label] + h2[u] >= minCost2.get(sink, float('inf')):
+            continue
+        minCost2[u] = cost2[label]
+
+        if u == sink:
+            path = list()
+            current = label
+            while parent[current] >= 0:
+                path.append((labelNode[parent[current]], labelNode[current]))
+                current = parent[current]
+            path.reverse()
+            result.append({'objVal': (cost1[label], cost2[label]), 'path': path})
+            continue
+
+        for v, data in G.succ[u].items():
+            if v not in h1:
+                continue
+            newCost1 = cost1[label] + data['length1']
+            newCost2 = cost2[label] + data['length2']
+            if newCost2 >= minCost2.get(v, float('inf')) or \
+                    newCost2 + h2[v] >= minCost2.get(sink, float('inf')):
+                continue
+            cost1.append(newCost1)
+            cost2.append(newCost2)
+            labelNode.append(v)
+            parent.append(label)
+            heapq.heappush(heap, (newCost1 + h1[v], newCost2 + h2[v], len(labelNode) - 1))
+
+    return result
 
 
 if __name__ == '__main__':
@@ -90,3 +192,9 @@ if __name__ == '__main__':
     result = epsConstraint(G, source, sink, M)
 
     print('Non-dominated points: {}'.format(result))
+
+    resultIncremental = epsConstraintIncremental(G, source, sink, M)
+    print('Non-dominated points (persistent model): {}'.format(resultIncremental))
+
+    resultLabelSetting = labelSetting(G, source, sink)
+    print('Non-dominated points (label setting): {}'.format(resultLabelSetting))
@@ -1,8 +1,11 @@
 from gurobipy import *
 import random as rd
+import numpy as np
+from solutionExtraction import extractValues, selectedKeys
 
 
-def solveHubLocation(customers: list, weights: dict, distances: dict, discountFactor: float, numHubs: int):
+def solveHubLocation(customers: list, weights: dict, distances: dict, discountFactor: float, numHubs: int,
+                     formulation: str = 'path'):
     """
     Solves the uncapacitated multiple allocation p-Hub median location problem.
     :param customers: List of customers
@@ -10,8 +13,15 @@ def solveHubLocation(customers: list, weights: dict, distances: dict, discountFa
     :param distances: Dict of distances (satisfying triangle inequality)
     :param discountFactor: Discount factor between 0 and 1
     :param numHubs: Number of hubs (smaller or equal number of customers)
+    :param formulation: String indicating whether the path-based formulation ('path'), the compact flow formulation
+    ('flow') or Benders decomposition ('benders') is used
     :return: Optimal hubs and routing through resulting hub network
     """
+    if formulation == 'flow':
+        return solveHubLocationFlow(customers, weights, distances, discountFactor, numHubs)
+    if formulation == 'benders':
+        return solveHubLocationBenders(customers, weights, distances, discountFactor, numHubs)
+
     HubLocation = Model('HubLocation')
 
     # Assignment variables
@@ -48,19 +58,247 @@ def solveHubLocation(customers: list, weights: dict, distances: dict, discountFa
     HubLocation.optimize()
 
     if HubLocation.status == GRB.OPTIMAL:
-        assignment = dict()
-        hubs = list()
+        assignment = extractValues(HubLocation, X)
+        hubs = selectedKeys(HubLocation, Y)
+
+        return assignment, hubs
+
+    else:
+        return list(), list()
+
+
+def hubArrays(customers: list, weights: dict, distances: dict):
+    """
+    Converts the weight and distance dicts into arrays (in the order of customers).
+    :param customers: List of customers
+    :param weights: Dict of weights
+    :param distances: Dict of distances
+    :return: Arrays of weights and distances
+    """
+    W = np.array([[weights[i, j] for j in customers] for i in customers], dtype=float)
+    D = np.array([[distances[i, j] for j in customers] for i in customers], dtype=float)
+    return W, D
+
+
+def hubRouting(W: np.ndarray, D: np.ndarray, discountFactor: float, hubs: list):
+    """
+    Computes the cheapest routing of every origin-destination pair through a given set of hubs.
+    :param W: Array of weights (origin x destination)
+    :param D: Array of distances
+    :param discountFactor: Discount factor between 0 and 1
+    :param hubs: List of hub indices
+    :return: Arrays of routing costs, first and second hub index (origin x destination)
+    """
+    hubs = np.asarray(hubs)
+    # Cost of i -> k -> l -> j for all hubs k, l (origin x k x l x destination is avoided by minimizing over k first)
+    collection = D[:, hubs][:, :, None] + discountFactor * D[np.ix_(hubs, hubs)][None, :, :]
+    firstHub = collection.argmin(axis=1)
+    toSecondHub = collection.min(axis=1)
+    total = toSecondHub[:, :, None] + D[hubs, :][None, :, :]
+    secondHub = total.argmin(axis=1)
+    cost = W * total.min(axis=1)
+    firstHub = np.take_along_axis(firstHub, secondHub, axis=1)
+    return cost, hubs[firstHub], hubs[secondHub]
+
+
+def routingAssignment(customers: list, W: np.ndarray, D: np.ndarray, discountFactor: float, hubs: list) -> dict:
+    """
+    Computes the assignment of every origin-destination pair to its cheapest hub route.
+    :param customers: List of customers
+    :param W: Array of weights
+    :param D: Array of distances
+    :param discountFactor: Discount factor between 0 and 1
+    :param hubs: List of hub indices
+    :return: Dict of routes (i, j, k, l) and values
+    """
+    _, firstHub, secondHub = hubRouting(W, D, discountFactor, hubs)
+    assignment = dict()
+    for i, u in enumerate(customers):
+        for j, v in enumerate(customers):
+            assignment[u, v, customers[firstHub[i, j]], customers[secondHub[i, j]]] = 1.0
+    return assignment
 
-        for i in customers:
-            if round(HubLocation.getVarByName(f'Y_{i}').x, 0) == 1:
-                hubs.append(i)
+
+def solveHubLocationFlow(customers: list, weights: dict, distances: dict, discountFactor: float, numHubs: int):
+    """
+    Solves the uncapacitated multiple allocation p-Hub median location problem with the compact flow formulation based on
+    Ernst and Krishnamoorthy (O(n^3) variables). Every unit of flow of origin i is collected at a hub k, transferred to
+    a hub l and distributed from l to its destination.
+    :param customers: List of customers
+    :param weights: Dict of weights
+    :param distances: Dict of distances (satisfying triangle inequality)
+    :param discountFactor: Discount factor between 0 and 1
+    :param numHubs: Number of hubs (smaller or equal number of customers)
+    :return: Optimal hubs and routing through resulting hub network
+    """
+    HubLocation = Model('HubLocationFlow')
+
+    outflow = {i: sum(weights[i, j] for j in customers) for i in customers}
+
+    # Hub variables
+    Y = dict()
+    # Collection, transfer and distribution flows of each origin
+    Z = dict()
+    T = dict()
+    X = dict()
+
+    for k in customers:
+        Y[k] = HubLocation.addVar(vtype=GRB.BINARY, name=f'Y_{k}')
+    for i in customers:
+        for k in customers:
+            Z[i, k] = HubLocation.addVar(vtype=GRB.CONTINUOUS, lb=0, name=f'Z_{i}_{k}')
+            for l in customers:
+                T[i, k, l] = HubLocation.addVar(vtype=GRB.CONTINUOUS, lb=0, name=f'T_{i}_{k}_{l}')
+                X[i, k, l] = HubLocation.addVar(vtype=GRB.CONTINUOUS, lb=0, name=f'X_{i}_{k}_{l}')
+
+    # Objective function
+    HubLocation.setObjective(quicksum(distances[i, k] * Z[i, k] for i, k in Z)
+                             + quicksum(discountFactor * distances[k, l] * T[i, k, l] for i, k, l in T)
+                             + quicksum(distances[l, j] * X[i, l, j] for i, l, j in X), sense=GRB.MINIMIZE)
+
+    # Constraints
+    HubLocation.addConstr(quicksum(Y[k] for k in customers), GRB.EQUAL, numHubs)
+
+    for i in customers:
+        HubLocation.addConstr(quicksum(Z[i, k] for k in customers), GRB.EQUAL, outflow[i])
+        for j in customers:
+            HubLocation.addConstr(quicksum(X[i, l, j] for l in customers), GRB.EQUAL, weights[i, j])
+        for k in customers:
+            HubLocation.addConstr(quicksum(T[i, k, l] for l in customers), GRB.EQUAL, Z[i, k])
+            HubLocation.addConstr(quicksum(T[i, l, k] for l in customers), GRB.EQUAL,
+                                  quicksum(X[i, k, j] for j in customers))
+            HubLocation.addConstr(Z[i, k], GRB.LESS_EQUAL, outflow[i] * Y[k])
             for j in customers:
-                for k in customers:
-                    for l in customers:
-                        if HubLocation.getVarByName(f'X_{i}_{j}_{k}_{l}').x > 0:
-                            assignment[i, j, k, l] = HubLocation.getVarByName(f'X_{i}_{j}_{k}_{l}').x
+                HubLocation.addConstr(X[i, k, j], GRB.LESS_EQUAL, weights[i, j] * Y[k])
 
-        return assignment, hubs
+    # Solve model
+    HubLocation.update()
+    HubLocation.optimize()
+
+    if HubLocation.status == GRB.OPTIMAL:
+        hubs = selectedKeys(HubLocation, Y)
+        W, D = hubArrays(customers, weights, distances)
+        index = {u: i for i, u in enumerate(customers)}
+        return routingAssignment(customers, W, D, discountFactor, [index[k] for k in hubs]), hubs
+
+    else:
+        return list(), list()
+
+
+def bendersCutCoefficients(model, hubs: list):
+    """
+    Computes the coefficients of the Benders optimality cuts theta_ij >= v_ij - sum_k s_ijk * Y_k for a set of hubs H.
+    v_ij is the routing cost of pair (i, j) through H. The savings s_ijk of the closed hubs cover every route that
+    uses closed hubs: routes via k alone or via k and an open hub are charged fully to k, routes via two closed hubs
+    are split equally between them. The cuts are valid for all hub sets.
+    :param model: Master model with attributes _W, _D, _discountFactor, _singleHubCost and _selfCost
+    :param hubs: List of hub indices
+    :return: Arrays of routing costs (origin x destination) and savings (origin x destination x hub)
+    """
+    W, D, discountFactor = model._W, model._D, model._discountFactor
+    cost, _, _ = hubRouting(W, D, discountFactor, hubs)
+
+    # Cheapest route of each pair through hub l and an open hub (in either order)
+    viaFirst = (D[:, hubs][:, :, None] + discountFactor * D[hubs, :][None, :, :]).min(axis=1)
+    viaSecond = (discountFactor * D[:, hubs][:, :, None] + D[hubs, :][None, :, :]).min(axis=1)
+    viaOpen = W[:, :, None] * np.minimum(viaFirst[:, None, :] + D.T[None, :, :],
+                                         D[:, None, :] + viaSecond.T[None, :, :])
+
+    v = cost[:, :, None]
+    savings = np.maximum(np.maximum(v - model._selfCost, v - viaOpen), (v - model._singleHubCost) / 2)
+    savings = np.maximum(0, savings)
+    savings[:, :, hubs] = 0
+    return cost, savings
+
+
+def bendersCuts(model, where):
+    """
+    Callback adding violated Benders optimality cuts (see bendersCutCoefficients) as lazy constraints. At integer
+    solutions the cuts are computed for the current hubs, at the root node for the numHubs largest fractional hub
+    values.
+    :param model: Master model with attributes _Y, _Theta, _numHubs and those of bendersCutCoefficients
+    :param where: Callback code
+    """
+    if where == GRB.Callback.MIPSOL:
+        values = np.array(model.cbGetSolution(model._Y))
+        theta = np.array(model.cbGetSolution(list(model._Theta.values())))
+    elif where == GRB.Callback.MIPNODE and model.cbGet(GRB.Callback.MIPNODE_STATUS) == GRB.OPTIMAL \
+            and model.cbGet(GRB.Callback.MIPNODE_NODCNT) == 0:
+        values = np.array(model.cbGetNodeRel(model._Y))
+        theta = np.array(model.cbGetNodeRel(list(model._Theta.values())))
+    else:
+        return
+
+    hubs = sorted(np.argsort(-values, kind='stable')[:model._numHubs].tolist())
+    cost, savings = bendersCutCoefficients(model, hubs)
+    theta = theta.reshape(cost.shape)
+    bound = cost - savings @ values
+
+    for i, j in zip(*np.nonzero(theta < bound - 1e-6 * np.maximum(1.0, cost))):
+        model.cbLazy(model._Theta[i, j] + quicksum(savings[i, j, k] * model._Y[k]
+                                                   for k in np.flatnonzero(savings[i, j])),
+                     GRB.GREATER_EQUAL, cost[i, j])
+
+
+def solveHubLocationBenders(customers: list, weights: dict, distances: dict, discountFactor: float, numHubs: int):
+    """
+    Solves the uncapacitated multiple allocation p-Hub median location problem by Benders decomposition. The master
+    problem chooses the hubs, the routing subproblem of each origin-destination pair is solved in closed form
+    (cheapest route through the open hubs) and added as lazy cut.
+    :param customers: List of customers
+    :param weights: Dict of weights
+    :param distances: Dict of distances (satisfying triangle inequality)
+    :param discountFactor: Discount factor between 0 and 1
+    :param numHubs: Number of hubs (smaller or equal number of customers)
+    :return: Optimal hubs and routing through resulting hub network
+    """
+    W, D = hubArrays(customers, weights, distances)
+    n = len(customers)
+
+    # Cheapest route of each pair (i, j) through hub k (as first or second hub): singleHubCost[i, j, k]
+    toDestination = (discountFactor * D[:, :, None] + D[None, :, :]).min(axis=1)
+    fromOrigin = (D[:, :, None] + discountFactor * D[None, :, :]).min(axis=1)
+    singleHubCost = W[:, :, None] * np.minimum(D[:, None, :] + toDestination.T[None, :, :],
+                                               fromOrigin[:, None, :] + D.T[None, :, :])
+    selfCost = W[:, :, None] * (D[:, None, :] + discountFactor * np.diag(D)[None, None, :] + D.T[None, :, :])
+    lowerBound = singleHubCost.min(axis=2)
+
+    HubLocation = Model('HubLocationBenders')
+
+    # Hub variables
+    Y = list()
+    # Routing cost of each origin-destination pair
+    Theta = dict()
+
+    for k in range(n):
+        Y.append(HubLocation.addVar(vtype=GRB.BINARY, name=f'Y_{customers[k]}'))
+    for i in range(n):
+        for j in range(n):
+            Theta[i, j] = HubLocation.addVar(vtype=GRB.CONTINUOUS, lb=lowerBound[i, j],
+                                             name=f'Theta_{customers[i]}_{customers[j]}')
+
+    # Objective function
+    HubLocation.setObjective(quicksum(Theta.values()), sense=GRB.MINIMIZE)
+
+    # Constraints
+    HubLocation.addConstr(quicksum(Y), GRB.EQUAL, numHubs)
+
+    # Solve model
+    HubLocation.update()
+    HubLocation._Y = Y
+    HubLocation._Theta = Theta
+    HubLocation._W = W
+    HubLocation._D = D
+    HubLocation._discountFactor = discountFactor
+    HubLocation._singleHubCost = singleHubCost
+    HubLocation._selfCost = selfCost
+    HubLocation._numHubs = numHubs
+    HubLocation.Params.LazyConstraints = 1
+    HubLocation.optimize(bendersCuts)
+
+    if HubLocation.status == GRB.OPTIMAL:
+        hubs = [k for k in range(n) if round(Y[k].x, 0) == 1]
+        return routingAssignment(customers, W, D, discountFactor, hubs), [customers[k] for k in hubs]
 
     else:
         return list(), list()
@@ -1,16 +1,18 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+from solutionExtraction import selectedKeys
+from budgetSweep import sweepBudgets
 
 
-def solveMaxFlowInterdiction(G: nx.DiGraph, interdictionBudget: int, source, sink) -> dict:
+def buildMaxFlowInterdiction(G: nx.DiGraph, interdictionBudget: int, source, sink):
     """
-    Solves the maximum flow network interdiction problem.
+    Builds the maximum flow network interdiction model.
     :param G: directed graph
     :param interdictionBudget: Interdiction budget (int)
     :param source: Source node in G
     :param sink: Sink node in G
-    :return: List of edges
+    :return: Model, dict of interdiction variables, budget constraint
     """
     maxFlowInterdiction = Model('maxFlowInterdiction')
 
@@ -30,28 +32,52 @@ def solveMaxFlowInterdiction(G: nx.DiGraph, interdictionBudget: int, source, sin
     maxFlowInterdiction.setObjective(quicksum(G[u][v]['capacity'] * Beta[u, v] for u, v in G.edges()), sense=GRB.MINIMIZE)
 
     # Constraints
-    maxFlowInterdiction.addConstr(quicksum(G[u][v]['cost']*Gamma[u,v] for u,v in G.edges()), GRB.LESS_EQUAL, interdictionBudget)
+    budget = maxFlowInterdiction.addConstr(quicksum(G[u][v]['cost']*Gamma[u,v] for u,v in G.edges()), GRB.LESS_EQUAL, interdictionBudget)
 
     maxFlowInterdiction.addConstr(Alpha[sink] - Alpha[source], GRB.GREATER_EQUAL, 1)
 
     for u,v in G.edges():
         maxFlowInterdiction.addConstr(Alpha[u] - Alpha[v] + Beta[u,v] + Gamma[u,v], GRB.GREATER_EQUAL, 0)
 
+    return maxFlowInterdiction, Gamma, budget
+
+
+def solveMaxFlowInterdiction(G: nx.DiGraph, interdictionBudget: int, source, sink) -> dict:
+    """
+    Solves the maximum flow network interdiction problem.
+    :param G: directed graph
+    :param interdictionBudget: Interdiction budget (int)
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :return: List of edges
+    """
+    maxFlowInterdiction, Gamma, budget = buildMaxFlowInterdiction(G, interdictionBudget, source, sink)
+
     # Solve model
     maxFlowInterdiction.update()
     maxFlowInterdiction.optimize()
 
     if maxFlowInterdiction.status == GRB.OPTIMAL:
-        interdictedEdges = list()
-        for u,v in G.edges():
-            if round(maxFlowInterdiction.getVarByName(f'Gamma_{u}_{v}').x, 0) == 1:
-                interdictedEdges.append((u,v))
-        return interdictedEdges
+        return selectedKeys(maxFlowInterdiction, Gamma)
 
     else:
         return list()
 
 
+def sweepMaxFlowInterdiction(G: nx.DiGraph, budgets: list, source, sink, processes: int = 1):
+    """
+    Solves the maximum flow network interdiction problem for a range of budgets (trade-off curve). The model is built
+    once per worker and only the budget is changed (see budgetSweep.sweepBudgets).
+    :param G: directed graph
+    :param budgets: List of interdiction budgets
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param processes: Number of worker processes (contiguous budget ranges)
+    :return: Array of budgets (ascending), array of maximum flows, list of lists of interdicted edges
+    """
+    return sweepBudgets(buildMaxFlowInterdiction, G, budgets, source, sink, processes)
+
+
 if __name__ == '__main__':
     # Example: Complete graph on 40 vertices
     G = nx.complete_graph(40)
@@ -67,4 +93,6 @@ if __name__ == '__main__':
     sol = solveMaxFlowInterdiction(H, interdictionBudget, source, sink)
     print('Interdicted edges: {}'.format(sol))
 
-
+    budgets, flows, interdictions = sweepMaxFlowInterdiction(H, list(range(0, 51, 5)), source, sink)
+    for budget, flow in zip(budgets, flows):
+        print('Budget {}: maximum flow {}'.format(budget, flow))
@@ -0,0 +1,70 @@
+from gurobipy import *
+import networkx as nx
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from solutionExtraction import selectedKeys
+
+
+def sweepBudgetRange(task: tuple):
+    """
+    Solves an interdiction model for an ascending range of budgets. The model is built once; for every budget only the
+    right-hand side of the budget constraint is changed, the previous solution (feasible for a larger budget) is used
+    as MIP start, and since the optimal value is monotone in the budget, the previous value is used as cutoff.
+    :param task: Tuple of model builder, graph, ascending list of budgets, source and sink
+    :return: List of optimal values, list of lists of interdicted edges
+    """
+    build, G, budgets, source, sink = task
+    model, variables, budget = build(G, budgets[0], source, sink)
+    model.update()
+    allVariables = model.getVars()
+
+    values, interdictions = [], []
+    start = None
+    for b in budgets:
+        budget.RHS = b
+        if start is not None:
+            model.setAttr(GRB.Attr.Start, allVariables, start)
+            slack = 1e-6 * (1 + abs(values[-1]))
+            model.setParam(GRB.Param.Cutoff, values[-1] + slack if model.ModelSense == GRB.MINIMIZE
+                           else values[-1] - slack)
+
+        model.optimize()
+
+        if model.status == GRB.OPTIMAL:
+            values.append(model.ObjVal)
+            interdictions.append(selectedKeys(model, variables))
+            start = model.getAttr(GRB.Attr.X, allVariables)
+        else:
+            values.append(np.nan)
+            interdictions.append(list())
+            start = None
+            model.resetParams()
+
+    return values, interdictions
+
+
+def sweepBudgets(build, G: nx.DiGraph, budgets: list, source, sink, processes: int = 1):
+    """
+    Computes the trade-off curve between interdiction budget and optimal value. The sorted budgets are split into
+    contiguous ranges, each range is swept with one model (see sweepBudgetRange), in worker processes if processes > 1.
+    :param build: Model builder returning model, dict of interdiction variables and budget constraint
+    :param G: directed graph
+    :param budgets: List of interdiction budgets
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param processes: Number of worker processes
+    :return: Array of budgets (ascending), array of optimal values, list of lists of interdicted edges
+    """
+    budgets = np.sort(np.asarray(budgets))
+    tasks = [(build, G, chunk.tolist(), source, sink) for chunk in np.array_split(budgets, max(1, processes))
+             if len(chunk) > 0]
+
+    if processes == 1:
+        results = [sweepBudgetRange(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(sweepBudgetRange, tasks))
+
+    values = np.array([value for result in results for value in result[0]])
+    interdictions = [interdiction for result in results for interdiction in result[1]]
+    return budgets, values, interdictions
@@ -1,13 +1,121 @@
 from gurobipy import *
 import networkx as nx
+import numpy as np
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from solutionExtraction import selectedKeys
 
 
-def solveClique(G: nx.Graph) -> list:
+def degeneracyClique(G: nx.Graph) -> list:
+    """
+    Computes a clique heuristically: every vertex is greedily extended by its neighbors of at least the same core
+    number (in decreasing core number order), the largest clique found is returned.
+    :param G: undirected graph
+    :return: List of nodes
+    """
+    core = nx.core_number(G)
+    best = []
+
+    for v in sorted(G.nodes(), key=lambda u: core[u], reverse=True):
+        if core[v] + 1 <= len(best):
+            break
+        clique = [v]
+        for w in sorted((w for w in G[v] if core[w] >= core[v]), key=lambda u: core[u], reverse=True):
+            if all(w in G[u] for u in clique):
+                clique.append(w)
+        if len(clique) > len(best):
+            best = clique
+
+    return best
+
+
+def coloringBound(G: nx.Graph) -> int:
+    """
+    Computes an upper bound on the clique number by a greedy coloring (largest degree first).
+    :param G: undirected graph
+    :return: Number of colors
+    """
+    coloring = nx.greedy_color(G, strategy='largest_first')
+    return max(coloring.values()) + 1 if coloring else 0
+
+
+def degeneracyOrdering(G: nx.Graph) -> list:
+    """
+    Computes a degeneracy (smallest-last) ordering by repeatedly removing a vertex of minimum remaining degree.
+    :param G: undirected graph
+    :return: List of nodes
+    """
+    degree = dict(G.degree())
+    buckets = [set() for _ in range(max(degree.values(), default=0) + 1)]
+    for u, d in degree.items():
+        buckets[d].add(u)
+
+    order = []
+    removed = set()
+    minimum = 0
+    while len(order) < len(degree):
+        minimum = max(minimum - 1, 0)
+        while not buckets[minimum]:
+            minimum += 1
+        u = buckets[minimum].pop()
+        order.append(u)
+        removed.add(u)
+        for w in G[u]:
+            if w not in removed:
+                buckets[degree[w]].remove(w)
+                degree[w] -= 1
+                buckets[degree[w]].add(w)
+
+    return order
+
+
+def cliqueCover(G: nx.Graph, nodes: list) -> list:
+    """
+    Covers the edges of the complement graph with maximal independent sets of G (cliques of the complement). Each set
+    S gives the clique inequality sum of X[v] for v in S <= 1.
+    :param G: undirected graph
+    :param nodes: List of nodes
+    :return: List of independent sets
+    """
+    n = len(nodes)
+    adjacency = nx.to_numpy_array(G, nodelist=nodes, dtype=bool, weight=None)
+    complement = ~adjacency
+    np.fill_diagonal(complement, False)
+    uncovered = complement.copy()
+
+    sets = []
+    for u in range(n):
+        while uncovered[u].any():
+            S = [u]
+            candidates = complement[u].copy()
+            covering = uncovered[u].copy()
+            # Prefer vertices which cover uncovered complement edges, then extend the set until it is maximal
+            while candidates.any():
+                preferred = candidates & covering
+                w = int(np.argmax(preferred if preferred.any() else candidates))
+                S.append(w)
+                candidates &= complement[w]
+                covering |= uncovered[w]
+            uncovered[np.ix_(S, S)] = False
+            sets.append([nodes[i] for i in S])
+
+    return sets
+
+
+def solveClique(G: nx.Graph, formulation: str = 'edge') -> list:
     """
     Solves the maximum clique problem.
     :param G: undirected graph
+    :param formulation: 'edge' (one inequality per non-adjacent pair), 'strengthened' (clique inequalities of the
+    complement graph, greedy-coloring upper bound and degeneracy heuristic incumbent as cutoff) or 'decomposition'
+    (parallel subproblems on the later neighbourhoods of a degeneracy ordering)
     :return: List of nodes
     """
+    if formulation == 'strengthened':
+        return solveCliqueStrengthened(G)
+    if formulation == 'decomposition':
+        return solveCliqueDecomposition(G)
+
     clique = Model('Clique')
 
     # Variable
@@ -29,20 +137,134 @@ def solveClique(G: nx.Graph) -> list:
     clique.optimize()
 
     if clique.status == GRB.OPTIMAL:
-        solution = list()
-        for u in G.nodes():
-            if round(clique.getVarByName(f'X_{u}').x, 0) == 1:
-                solution.append(u)
-        return solution
+        return selectedKeys(clique, X)
 
     else:
         return None
 
 
+def solveCliqueStrengthened(G: nx.Graph) -> list:
+    """
+    Solves the maximum clique problem with clique inequalities covering the complement graph. Vertices whose core
+    number rules out a clique larger than the heuristic incumbent are removed beforehand.
+    :param G: undirected graph
+    :return: List of nodes
+    """
+    incumbent = degeneracyClique(G)
+    upperBound = coloringBound(G)
+    if len(incumbent) == upperBound:
+        return incumbent
+
+    core = nx.core_number(G)
+    nodes = [u for u in G.nodes() if core[u] + 1 > len(incumbent) or u in incumbent]
+
+    clique = Model('Clique')
+
+    # Variable
+    X = dict()
+
+    for u in nodes:
+        X[u] = clique.addVar(vtype=GRB.BINARY, name=f'X_{u}')
+        X[u].Start = 1 if u in incumbent else 0
+
+    # Constraints
+    for S in cliqueCover(G, nodes):
+        clique.addConstr(quicksum(X[u] for u in S), GRB.LESS_EQUAL, 1)
+
+    clique.addConstr(quicksum(X[u] for u in nodes), GRB.LESS_EQUAL, upperBound)
+
+    # Objective function
+    clique.setObjective(quicksum(X[u] for u in nodes), sense=GRB.MAXIMIZE)
+
+    clique.setParam('Cutoff', len(incumbent))
+
+    clique.update()
+    clique.optimize()
+
+    if clique.status == GRB.OPTIMAL:
+        return selectedKeys(clique, X)
+
+    else:
+        return incumbent
+
+
+sharedBest = None
+
+
+def initCliqueWorker(best):
+    """
+    Stores the shared best-known clique size in a worker process.
+    :param best: Shared integer value
+    """
+    global sharedBest
+    sharedBest = best
+
+
+def solveCliqueSubproblem(task: tuple) -> list:
+    """
+    Solves the maximum clique problem on the later neighbourhood of a vertex, unless it cannot beat the best-known size.
+    :param task: Tuple of vertex and subgraph induced by its later neighbourhood
+    :return: List of nodes (empty if pruned)
+    """
+    v, H = task
+    if H.number_of_nodes() + 1 <= sharedBest.value or coloringBound(H) + 1 <= sharedBest.value:
+        return []
+
+    clique = [v] + solveCliqueStrengthened(H) if H.number_of_nodes() > 0 else [v]
+
+    with sharedBest.get_lock():
+        if len(clique) > sharedBest.value:
+            sharedBest.value = len(clique)
+
+    return clique
+
+
+def solveCliqueDecomposition(G: nx.Graph, processes: int = None) -> list:
+    """
+    Solves the maximum clique problem by a degeneracy decomposition: for every vertex, the maximum clique among its
+    later neighbours in a degeneracy ordering is computed. Subproblems run in a process pool and are skipped if their
+    size, core number or coloring bound cannot beat the best-known clique size, which is shared between the workers.
+    :param G: undirected graph
+    :param processes: Number of worker processes (default: number of CPUs)
+    :return: List of nodes
+    """
+    incumbent = degeneracyClique(G)
+    core = nx.core_number(G)
+    order = degeneracyOrdering(G)
+    position = {u: i for i, u in enumerate(order)}
+
+    tasks = []
+    for v in order:
+        later = [w for w in G[v] if position[w] > position[v]]
+        if core[v] + 1 > len(incumbent) and len(later) + 1 > len(incumbent):
+            tasks.append((v, G.subgraph(later).copy()))
+
+    # Large neighbourhoods first, they are most likely to raise the shared best-known size
+    tasks.sort(key=lambda task: task[1].number_of_nodes(), reverse=True)
+
+    best = mp.Value('i', len(incumbent))
+    with ProcessPoolExecutor(processes, initializer=initCliqueWorker, initargs=(best,)) as executor:
+        for clique in executor.map(solveCliqueSubproblem, tasks):
+            if len(clique) > len(incumbent):
+                incumbent = clique
+
+    return incumbent
+
+
 if __name__ == '__main__':
     # Example: Graph with 5 nodes and 5 edges
     G = nx.Graph()
     G.add_edges_from([(2,3), (3,1), (3,4), (3,5), (4,5)])
 
     sol = solveClique(G)
-    print('Clique nodes: {}'.format(sol))
\ No newline at end of file
+    print('Clique nodes: {}'.format(sol))
+
+    # Example: Sparse random graph with 150 nodes
+    G = nx.gnm_random_graph(150, 1000, seed=1)
+    sol = solveClique(G, 'strengthened')
+    print('Clique nodes: {}'.format(sol))
+
+    # Example: Sparse scale-free graph with 5000 nodes
+    G = nx.barabasi_albert_graph(5000, 5, seed=1)
+    sol = solveClique(G, 'decomposition')
+    print('Clique nodes: {}'.format(sol))
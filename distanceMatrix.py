@@ -0,0 +1,134 @@
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import dijkstra
+from concurrent.futures import ProcessPoolExecutor
+import random as rd
+import tempfile
+import os
+
+
+class DistanceRow:
+    """
+    Row of a distance matrix that can be indexed by node.
+    """
+
+    def __init__(self, row: np.ndarray, index: dict):
+        self.row = row
+        self.index = index
+
+    def __getitem__(self, v):
+        return float(self.row[self.index[v]])
+
+
+class DistanceMatrix:
+    """
+    Array-backed all-pairs distance matrix (usually a float32 np.memmap on disk). distances[u][v] works as for the
+    dict of dicts returned by nx.all_pairs_dijkstra_path_length, the array itself is available as attribute array.
+    """
+
+    def __init__(self, array: np.ndarray, nodes: list):
+        self.array = array
+        self.nodes = nodes
+        self.index = {v: i for i, v in enumerate(nodes)}
+
+    def __getitem__(self, u):
+        return DistanceRow(self.array[self.index[u]], self.index)
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+workerAdjacency = None
+workerMatrix = None
+
+
+def initDistanceWorker(adjacency: sp.csr_matrix, directed: bool, path: str):
+    """
+    Stores the adjacency matrix and opens the memory-mapped distance matrix in a worker process.
+    :param adjacency: Sparse weighted adjacency matrix
+    :param directed: Whether the graph is directed
+    :param path: Path of the distance matrix file
+    """
+    global workerAdjacency, workerMatrix
+    workerAdjacency = (adjacency, directed)
+    workerMatrix = np.memmap(path, dtype=np.float32, mode='r+', shape=adjacency.shape)
+
+
+def computeDistanceRows(rows: tuple):
+    """
+    Computes the shortest path distances from a range of source nodes and writes them into the distance matrix.
+    :param rows: Tuple of first and last (exclusive) row
+    """
+    adjacency, directed = workerAdjacency
+    workerMatrix[rows[0]:rows[1]] = dijkstra(adjacency, directed=directed, indices=np.arange(*rows))
+    workerMatrix.flush()
+
+
+def computeDistanceMatrix(G: nx.Graph, path: str, weight: str = 'length', chunkSize: int = 256,
+                          processes: int = None) -> DistanceMatrix:
+    """
+    Computes all-pairs shortest path distances with scipy.sparse.csgraph in row chunks across a process pool. The
+    rows are written into a float32 np.memmap file, which can be shared between processes without copying.
+    :param G: (directed or undirected) graph
+    :param path: Path of the distance matrix file
+    :param weight: Name of the edge attribute used as length
+    :param chunkSize: Number of source nodes per task
+    :param processes: Number of worker processes (default: number of CPUs)
+    :return: Distance matrix
+    """
+    nodes = list(G.nodes())
+    index = {v: i for i, v in enumerate(nodes)}
+    n = len(nodes)
+
+    tails, heads, lengths = zip(*((index[u], index[v], length) for u, v, length in G.edges(data=weight))) \
+        if G.number_of_edges() > 0 else ((), (), ())
+    adjacency = sp.csr_matrix((np.array(lengths, dtype=float), (np.array(tails, dtype=np.int64),
+                                                                np.array(heads, dtype=np.int64))), shape=(n, n))
+
+    matrix = np.memmap(path, dtype=np.float32, mode='w+', shape=(n, n))
+    del matrix
+
+    chunks = [(start, min(n, start + chunkSize)) for start in range(0, n, chunkSize)]
+    with ProcessPoolExecutor(processes, initializer=initDistanceWorker,
+                             initargs=(adjacency, G.is_directed(), path)) as executor:
+        list(executor.map(computeDistanceRows, chunks))
+
+    return loadDistanceMatrix(path, nodes)
+
+
+def loadDistanceMatrix(path: str, nodes: list) -> DistanceMatrix:
+    """
+    Opens a distance matrix file read-only.
+    :param path: Path of the distance matrix file
+    :param nodes: List of nodes (in row order)
+    :return: Distance matrix
+    """
+    return DistanceMatrix(np.memmap(path, dtype=np.float32, mode='r', shape=(len(nodes), len(nodes))), nodes)
+
+
+def distanceArray(distances, nodes: list) -> np.ndarray:
+    """
+    Returns the distances between the given nodes as array. A DistanceMatrix with the same node order is returned
+    without copying.
+    :param distances: DistanceMatrix or dict of dicts of distances
+    :param nodes: List of nodes
+    :return: Array of distances
+    """
+    if isinstance(distances, DistanceMatrix):
+        if nodes == distances.nodes:
+            return distances.array
+        rows = np.array([distances.index[v] for v in nodes])
+        return distances.array[np.ix_(rows, rows)]
+    return np.array([[distances[u][v] for v in nodes] for u in nodes], dtype=float)
+
+
+if __name__ == '__main__':
+    # Example: Random geometric graph on 2000 vertices
+    G = nx.random_geometric_graph(2000, 0.05, seed=1)
+    for u, v in G.edges():
+        G[u][v]['length'] = rd.randint(1, 23)
+
+    path = os.path.join(tempfile.mkdtemp(), 'distances.dat')
+    distances = computeDistanceMatrix(G, path)
+    print('Distance matrix of shape {} stored in {}'.format(distances.array.shape, path))
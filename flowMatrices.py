@@ -0,0 +1,48 @@
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+
+
+def incidenceMatrix(G: nx.DiGraph):
+    """
+    Computes the node-arc incidence matrix of a directed graph (+1 for outgoing, -1 for incoming arcs).
+    :param G: directed graph
+    :return: Sparse incidence matrix (nodes x arcs), dict of nodes and row indices, list of arcs (column order)
+    """
+    nodeIndex = {v: i for i, v in enumerate(G.nodes())}
+    edges = list(G.edges())
+    m = len(edges)
+
+    tails = np.fromiter((nodeIndex[u] for u, v in edges), dtype=np.int64, count=m)
+    heads = np.fromiter((nodeIndex[v] for u, v in edges), dtype=np.int64, count=m)
+    columns = np.arange(m)
+
+    A = sp.csr_matrix((np.concatenate([np.ones(m), -np.ones(m)]),
+                       (np.concatenate([tails, heads]), np.concatenate([columns, columns]))),
+                      shape=(len(nodeIndex), m))
+    return A, nodeIndex, edges
+
+
+def edgeAttributes(G: nx.DiGraph, attribute: str) -> np.ndarray:
+    """
+    Collects an edge attribute into an array (in the edge order of G).
+    :param G: directed graph
+    :param attribute: Name of the edge attribute
+    :return: Array of attribute values
+    """
+    return np.fromiter((value for u, v, value in G.edges(data=attribute)), dtype=float, count=G.number_of_edges())
+
+
+def supplyVector(nodeIndex: dict, source, sink, value: float = 1) -> np.ndarray:
+    """
+    Computes the right-hand side of the flow conservation constraints for sending value units from source to sink.
+    :param nodeIndex: Dict of nodes and row indices
+    :param source: Source node
+    :param sink: Sink node
+    :param value: Flow value
+    :return: Array of net supplies
+    """
+    b = np.zeros(len(nodeIndex))
+    b[nodeIndex[source]] = value
+    b[nodeIndex[sink]] = -value
+    return b
@@ -1,16 +1,156 @@
 from gurobipy import *
+import numpy as np
 import random as rd
+from concurrent.futures import ProcessPoolExecutor
+from solutionExtraction import selectedKeys
 
 
-def solveKnaosack(items: list, profits: dict, weights: dict, capacity: int) -> list:
+def knapsackDPBatch(P: np.ndarray, W: np.ndarray, capacities: np.ndarray) -> np.ndarray:
+    """
+    Solves many binary knapsack problems with the same number of items by dynamic programming over the capacity,
+    vectorized over the instances.
+    :param P: Array of profits (instances x items)
+    :param W: Array of non-negative integer weights (instances x items)
+    :param capacities: Array of integer capacities
+    :return: Boolean array of selected items (instances x items)
+    """
+    P = np.asarray(P, dtype=float)
+    W = np.asarray(W, dtype=np.int64)
+    capacities = np.asarray(capacities, dtype=np.int64)
+    K, n = P.shape
+    rows = np.arange(K)[:, None]
+    t = np.arange(capacities.max(initial=0) + 1)[None, :]
+
+    # V[k, t] is the maximum profit of instance k with capacity t
+    V = np.zeros((K, t.shape[1]))
+    keep = np.zeros((n, K, t.shape[1]), dtype=bool)
+    for i in range(n):
+        rest = t - W[:, [i]]
+        candidate = np.where(rest >= 0, V[rows, np.maximum(rest, 0)] + P[:, [i]], -np.inf)
+        keep[i] = candidate > V
+        V = np.maximum(V, candidate)
+
+    # Reconstruction
+    X = np.zeros((K, n), dtype=bool)
+    remaining = capacities.copy()
+    for i in reversed(range(n)):
+        X[:, i] = keep[i, np.arange(K), remaining]
+        remaining -= X[:, i] * W[:, i]
+
+    return X
+
+
+def knapsackCore(p: np.ndarray, w: np.ndarray, capacity: int, core: int = 8) -> np.ndarray:
+    """
+    Solves the binary knapsack problem with a core algorithm: the items are sorted by efficiency, items far before the
+    break item are fixed to 1 and items far after it to 0, and only the core around the break item is solved by
+    dynamic programming. Items which the Dembo-Hammer bounds cannot fix with respect to the value of this core are
+    added to the core, which is then solved once more. On strongly correlated instances (p = w + const) the bounds fix
+    few items and the effort approaches that of the full dynamic program.
+    :param p: Array of profits
+    :param w: Array of non-negative integer weights
+    :param capacity: Knapsack capacity
+    :param core: Number of items on each side of the break item in the initial core
+    :return: Boolean array of selected items
+    """
+    p = np.asarray(p, dtype=float)
+    w = np.asarray(w, dtype=np.int64)
+    x = np.zeros(len(p), dtype=bool)
+
+    # Items without weight are always packed, items with no profit or too much weight never
+    x[(w == 0) & (p > 0)] = True
+    candidates = np.flatnonzero((w > 0) & (p > 0) & (w <= capacity))
+    if len(candidates) == 0:
+        return x
+
+    order = candidates[np.argsort(-p[candidates] / w[candidates], kind='stable')]
+    cumulative = np.cumsum(w[order])
+    b = int(np.searchsorted(cumulative, capacity, side='right'))
+    if b == len(order):
+        x[order] = True
+        return x
+
+    # Dembo-Hammer bounds: flipping item j from its LP value reduces the LP bound by at least |p_j - r w_j|
+    r = p[order[b]] / w[order[b]]
+    packed = cumulative[b - 1] if b > 0 else 0
+    lpBound = p[order[:b]].sum() + r * (capacity - packed)
+    reduction = np.abs(p[order] - r * w[order])
+
+    # Core around the break item: items before it are fixed to 1, items after it to 0
+    first, last = max(0, b - core), min(len(order), b + core + 1)
+    inner = np.arange(first, last)
+    selection = knapsackDPBatch(p[order[inner]][None, :], w[order[inner]][None, :],
+                                [capacity - w[order[:first]].sum()])[0]
+    value = p[order[:first]].sum() + p[order[inner]][selection].sum()
+
+    # Items whose bound does not exceed the core value keep their LP value in some optimal solution, the others are
+    # added to the core (selected by bound, not by position, so distant items with small reductions do not blow up
+    # the core)
+    free = np.zeros(len(order), dtype=bool)
+    free[inner] = True
+    free |= lpBound - reduction > value + 1e-9
+    if free[:first].any() or free[last:].any():
+        inner = np.flatnonzero(free)
+        fixed = np.flatnonzero(~free[:b])
+        selection = knapsackDPBatch(p[order[inner]][None, :], w[order[inner]][None, :],
+                                    [capacity - w[order[fixed]].sum()])[0]
+    else:
+        fixed = np.arange(first)
+
+    x[order[fixed]] = True
+    x[order[inner[selection]]] = True
+    return x
+
+
+def solveKnapsackChunk(chunk: tuple) -> np.ndarray:
+    """
+    Solves a chunk of knapsack problems in a worker process.
+    :param chunk: Tuple of profits, weights and capacities
+    :return: Boolean array of selected items
+    """
+    return knapsackDPBatch(*chunk)
+
+
+def solveKnapsackBatch(P: np.ndarray, W: np.ndarray, capacities: np.ndarray, chunkSize: int = 1024,
+                       processes: int = 1) -> np.ndarray:
+    """
+    Solves many binary knapsack problems (e.g. pricing subproblems) without building models: the instances are split
+    into chunks, each chunk is solved in one vectorized dynamic program, the chunks are distributed over a process
+    pool if processes > 1.
+    :param P: Array of profits (instances x items)
+    :param W: Array of non-negative integer weights (instances x items)
+    :param capacities: Array of integer capacities
+    :param chunkSize: Number of instances per vectorized dynamic program
+    :param processes: Number of worker processes (None: number of CPUs)
+    :return: Boolean array of selected items (instances x items)
+    """
+    chunks = [(P[start:start + chunkSize], W[start:start + chunkSize], capacities[start:start + chunkSize])
+              for start in range(0, len(P), chunkSize)]
+
+    if processes == 1:
+        return np.vstack([solveKnapsackChunk(chunk) for chunk in chunks])
+
+    with ProcessPoolExecutor(processes) as executor:
+        return np.vstack(list(executor.map(solveKnapsackChunk, chunks)))
+
+
+def solveKnaosack(items: list, profits: dict, weights: dict, capacity: int, engine: str = 'gurobi') -> list:
     """
     Solves the binary knapsack problem.
     :param items: List of items
     :param profits: Profit values of the items
     :param weights: Weight values of the items
     :param capacity: Knapsack capacity
+    :param engine: 'gurobi', 'dp' (dynamic programming over the capacity) or 'core' (core algorithm), the latter two
+    require integer weights
     :return: List of items
     """
+    if engine in ('dp', 'core'):
+        p = np.array([profits[i] for i in items], dtype=float)
+        w = np.array([weights[i] for i in items], dtype=np.int64)
+        x = knapsackDPBatch(p[None, :], w[None, :], [capacity])[0] if engine == 'dp' else knapsackCore(p, w, capacity)
+        return [i for i, selected in zip(items, x) if selected]
+
     knapsack = Model('knapsack')
 
     # Variable
@@ -31,11 +171,7 @@ def solveKnaosack(items: list, profits: dict, weights: dict, capacity: int) -> l
 
 
     if knapsack.status == GRB.OPTIMAL:
-        optitems = list()
-        for i in items:
-            if round(knapsack.getVarByName(f'X_{i}').x, 0) == 1:
-                optitems.append(i)
-        return optitems
+        return selectedKeys(knapsack, X)
 
     else:
         return list()
@@ -52,3 +188,11 @@ if __name__ == '__main__':
     optitems = solveKnaosack(items, profits, weights, capacity)
     print('Optimal items: {}'.format(optitems))
 
+    optitems = solveKnaosack(items, profits, weights, capacity, engine='core')
+    print('Optimal items (core algorithm): {}'.format(optitems))
+
+    # Example: Batch of 50000 knapsacks with 20 items each
+    P = np.random.randint(1, 50, size=(50000, 20))
+    W = np.random.randint(1, 30, size=(50000, 20))
+    solutions = solveKnapsackBatch(P, W, np.full(50000, 100))
+    print('Batch: {} instances, mean profit {:.2f}'.format(len(solutions), (P * solutions).sum(axis=1).mean()))
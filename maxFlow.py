@@ -1,15 +1,105 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+from collections import deque
+import numpy as np
+import scipy.sparse as sp
+from solutionExtraction import extractValues, formatValues
+from flowMatrices import incidenceMatrix, edgeAttributes, supplyVector
 
-def solveMaxFlow(G: nx.DiGraph, source: int, sink: int) -> dict:
+def dinic(G: nx.DiGraph, source, sink, capacity: str = 'capacity') -> list:
+    """
+    Computes a maximum flow with Dinic's algorithm on an array-based residual graph. Arc 2i is edge i of G and
+    arc 2i+1 its reverse arc.
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param capacity: Name of the edge attribute used as capacity
+    :return: List of flow values (in the edge order of G)
+    """
+    nodeIndex = {v: i for i, v in enumerate(G.nodes())}
+    n, m = len(nodeIndex), G.number_of_edges()
+
+    head = [0] * (2 * m)
+    residual = [0] * (2 * m)
+    adjacency = [[] for _ in range(n)]
+    for i, (u, v, c) in enumerate(G.edges(data=capacity)):
+        head[2 * i], head[2 * i + 1] = nodeIndex[v], nodeIndex[u]
+        residual[2 * i] = c
+        adjacency[nodeIndex[u]].append(2 * i)
+        adjacency[nodeIndex[v]].append(2 * i + 1)
+
+    s, t = nodeIndex[source], nodeIndex[sink]
+
+    while True:
+        # Breadth-first search for the level graph
+        level = [-1] * n
+        level[s] = 0
+        queue = deque([s])
+        while queue:
+            u = queue.popleft()
+            for a in adjacency[u]:
+                if residual[a] > 0 and level[head[a]] < 0:
+                    level[head[a]] = level[u] + 1
+                    queue.append(head[a])
+        if level[t] < 0:
+            break
+
+        # Blocking flow by repeated depth-first search with current-arc pointers
+        pointer = [0] * n
+        path = list()
+        u = s
+        while True:
+            if u == t:
+                bottleneck = min(residual[a] for a in path)
+                for a in path:
+                    residual[a] -= bottleneck
+                    residual[a ^ 1] += bottleneck
+                path = list()
+                u = s
+                continue
+
+            arcs = adjacency[u]
+            while pointer[u] < len(arcs):
+                a = arcs[pointer[u]]
+                if residual[a] > 0 and level[head[a]] == level[u] + 1:
+                    break
+                pointer[u] += 1
+
+            if pointer[u] < len(arcs):
+                path.append(arcs[pointer[u]])
+                u = head[arcs[pointer[u]]]
+            elif u == s:
+                break
+            else:
+                # Dead end: remove u from the level graph and retreat
+                level[u] = -1
+                u = head[path.pop() ^ 1]
+                pointer[u] += 1
+
+    return [residual[2 * i + 1] for i in range(m)]
+
+
+def solveMaxFlow(G: nx.DiGraph, source: int, sink: int, output: str = 'dict', builder: str = 'quicksum',
+                 engine: str = 'gurobi') -> dict:
     """
     Solves the maximum flow problem.
     :param G: directed graph
     :param source: Source node in G
     :param sink: Sink node in G
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :param builder: String indicating whether the model is built with quicksum expressions ('quicksum') or from the
+    sparse node-arc incidence matrix ('matrix')
+    :param engine: String indicating whether the linear program is solved with Gurobi ('gurobi') or Dinic's algorithm
+    is used ('dinic')
     :return: Dict of edges and flow values
     """
+    if engine == 'dinic':
+        return formatValues(list(G.edges()), np.array(dinic(G, source, sink), dtype=float), output)
+
+    if builder == 'matrix':
+        return solveMaxFlowMatrix(G, source, sink, output)
+
     maxFlow = Model('MaxFlow')
 
     # Variable
@@ -40,11 +130,45 @@ def solveMaxFlow(G: nx.DiGraph, source: int, sink: int) -> dict:
     maxFlow.optimize()
 
     if maxFlow.status == GRB.OPTIMAL:
-        flows = dict()
-        for a in G.edges():
-            if maxFlow.getVarByName(f'X_{a}').x > 0:
-                flows[a] = maxFlow.getVarByName(f'X_{a}').x
-        return flows
+        return extractValues(maxFlow, X, output)
+
+    else:
+        return dict()
+
+
+def solveMaxFlowMatrix(G: nx.DiGraph, source: int, sink: int, output: str = 'dict') -> dict:
+    """
+    Solves the maximum flow problem with a model built from the sparse node-arc incidence matrix.
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :return: Dict of edges and flow values
+    """
+    maxFlow = Model('MaxFlow')
+
+    A, nodeIndex, edges = incidenceMatrix(G)
+    m = len(edges)
+
+    # Variables: arc flows followed by the flow value B
+    capacity = edgeAttributes(G, 'capacity')
+    X = maxFlow.addMVar(m + 1, lb=0, ub=np.append(capacity, GRB.INFINITY), name='X')
+
+    # Objective function
+    c = np.zeros(m + 1)
+    c[m] = 1
+    maxFlow.setMObjective(None, c, 0, xc=X, sense=GRB.MAXIMIZE)
+
+    # Constraints
+    b = supplyVector(nodeIndex, source, sink)
+    maxFlow.addMConstr(sp.hstack([A, sp.csr_matrix(-b).T], format='csr'), X, GRB.EQUAL, np.zeros(len(nodeIndex)))
+
+    # Solve model
+    maxFlow.update()
+    maxFlow.optimize()
+
+    if maxFlow.status == GRB.OPTIMAL:
+        return formatValues(edges, X.X[:m], output)
 
     else:
         return dict()
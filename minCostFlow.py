@@ -1,17 +1,130 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+import heapq
+import numpy as np
+from solutionExtraction import extractValues, formatValues
+from flowMatrices import incidenceMatrix, edgeAttributes, supplyVector
 
 
-def solveMinCostFlow(G: nx.DiGraph, source: int, sink: int, demand: int) -> dict:
+def successiveShortestPaths(G: nx.DiGraph, source, sink, demand: int, costs: list = None,
+                            capacities: list = None) -> list:
+    """
+    Computes a minimum cost flow by successive shortest paths with node potentials (Dijkstra on reduced costs) on an
+    array-based residual graph. Arc 2i is edge i of G and arc 2i+1 its reverse arc. The graph must not contain
+    cycles of negative cost.
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param demand: Demand value
+    :param costs: Optional list of edge costs (in the edge order of G, replaces the edge attribute)
+    :param capacities: Optional list of edge capacities (in the edge order of G, replaces the edge attribute)
+    :return: List of flow values (in the edge order of G) or None if the demand cannot be routed
+    """
+    nodeIndex = {v: i for i, v in enumerate(G.nodes())}
+    n, m = len(nodeIndex), G.number_of_edges()
+
+    head = [0] * (2 * m)
+    residual = [0] * (2 * m)
+    cost = [0] * (2 * m)
+    adjacency = [[] for _ in range(n)]
+    for i, (u, v, data) in enumerate(G.edges(data=True)):
+        c = data['cost'] if costs is None else costs[i]
+        head[2 * i], head[2 * i + 1] = nodeIndex[v], nodeIndex[u]
+        residual[2 * i] = data['capacity'] if capacities is None else capacities[i]
+        cost[2 * i], cost[2 * i + 1] = c, -c
+        adjacency[nodeIndex[u]].append(2 * i)
+        adjacency[nodeIndex[v]].append(2 * i + 1)
+
+    s, t = nodeIndex[source], nodeIndex[sink]
+
+    # Initial potentials (Bellman-Ford only needed for negative costs)
+    potential = [0] * n
+    if any(c < 0 for c in cost[::2]):
+        potential = [float('inf')] * n
+        potential[s] = 0
+        for _ in range(n - 1):
+            changed = False
+            for u in range(n):
+                if potential[u] == float('inf'):
+                    continue
+                for a in adjacency[u]:
+                    if residual[a] > 0 and potential[u] + cost[a] < potential[head[a]]:
+                        potential[head[a]] = potential[u] + cost[a]
+                        changed = True
+            if not changed:
+                break
+        potential = [p if p < float('inf') else 0 for p in potential]
+
+    remaining = demand
+    while remaining > 0:
+        # Dijkstra on reduced costs
+        distance = [float('inf')] * n
+        predecessor = [-1] * n
+        settled = [False] * n
+        distance[s] = 0
+        heap = [(0, s)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if settled[u]:
+                continue
+            settled[u] = True
+            for a in adjacency[u]:
+                v = head[a]
+                # Reduced costs are nonnegative up to rounding errors of fractional costs, settled nodes are final
+                newDistance = d + max(0, cost[a] + potential[u] - potential[v])
+                if residual[a] > 0 and not settled[v] and newDistance < distance[v]:
+                    distance[v] = newDistance
+                    predecessor[v] = a
+                    heapq.heappush(heap, (newDistance, v))
+
+        if distance[t] == float('inf'):
+            return None
+
+        for v in range(n):
+            if distance[v] < float('inf'):
+                potential[v] += distance[v]
+
+        # Augment along the shortest path
+        path = list()
+        v = t
+        while v != s:
+            if len(path) >= n:
+                raise RuntimeError('Predecessor arcs of the shortest path tree form a cycle')
+            path.append(predecessor[v])
+            v = head[predecessor[v] ^ 1]
+        bottleneck = min(remaining, min(residual[a] for a in path))
+        for a in path:
+            residual[a] -= bottleneck
+            residual[a ^ 1] += bottleneck
+        remaining -= bottleneck
+
+    return [residual[2 * i + 1] for i in range(m)]
+
+
+def solveMinCostFlow(G: nx.DiGraph, source: int, sink: int, demand: int, output: str = 'dict',
+                     builder: str = 'quicksum', engine: str = 'gurobi') -> dict:
     """
     Solves the minimum cost flow problem.
     :param G: directed graph
     :param source: Source node in G
     :param sink: Sink node in G
     :param demand: Demand value
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :param builder: String indicating whether the model is built with quicksum expressions ('quicksum') or from the
+    sparse node-arc incidence matrix ('matrix')
+    :param engine: String indicating whether the linear program is solved with Gurobi ('gurobi') or the successive
+    shortest paths algorithm is used ('ssp')
     :return: Dict of edges and flow values
     """
+    if engine == 'ssp':
+        flows = successiveShortestPaths(G, source, sink, demand)
+        if flows is None:
+            return dict()
+        return formatValues(list(G.edges()), np.array(flows, dtype=float), output)
+
+    if builder == 'matrix':
+        return solveMinCostFlowMatrix(G, source, sink, demand, output)
 
     minCostFlow = Model('MinCostFlow')
 
@@ -42,11 +155,41 @@ def solveMinCostFlow(G: nx.DiGraph, source: int, sink: int, demand: int) -> dict
     minCostFlow.optimize()
 
     if minCostFlow.status == GRB.OPTIMAL:
-        flows = dict()
-        for a in G.edges():
-            if minCostFlow.getVarByName(f'X_{a}').x > 0:
-                flows[a] = minCostFlow.getVarByName(f'X_{a}').x
-        return flows
+        return extractValues(minCostFlow, X, output)
+
+    else:
+        return dict()
+
+
+def solveMinCostFlowMatrix(G: nx.DiGraph, source: int, sink: int, demand: int, output: str = 'dict') -> dict:
+    """
+    Solves the minimum cost flow problem with a model built from the sparse node-arc incidence matrix.
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param demand: Demand value
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :return: Dict of edges and flow values
+    """
+    minCostFlow = Model('MinCostFlow')
+
+    A, nodeIndex, edges = incidenceMatrix(G)
+
+    # Variable
+    X = minCostFlow.addMVar(len(edges), lb=0, ub=edgeAttributes(G, 'capacity'), name='X')
+
+    # Objective function
+    minCostFlow.setMObjective(None, edgeAttributes(G, 'cost'), 0, xc=X, sense=GRB.MINIMIZE)
+
+    # Constraints
+    minCostFlow.addMConstr(A, X, GRB.EQUAL, supplyVector(nodeIndex, source, sink, demand))
+
+    # Solve model
+    minCostFlow.update()
+    minCostFlow.optimize()
+
+    if minCostFlow.status == GRB.OPTIMAL:
+        return formatValues(edges, X.X, output)
 
     else:
         return dict()
@@ -64,5 +207,17 @@ if __name__ == '__main__':
 
     print('Min cost flow edges: {}'.format(flows))
 
+    # Example: Fractional costs with successive shortest paths (reduced costs with rounding errors)
+    for seed in range(300):
+        H = nx.gnp_random_graph(12, 0.4, seed=seed, directed=True)
+        for a in H.edges():
+            H[a[0]][a[1]]['capacity'] = rd.randint(1, 8)
+            H[a[0]][a[1]]['cost'] = rd.random() * 10
+        flows = solveMinCostFlow(H, 0, 11, 3, engine='ssp')
+        if flows:
+            assert abs(sum(flow for a, flow in flows.items() if a[0] == 0) -
+                       sum(flow for a, flow in flows.items() if a[1] == 0) - 3) < 1e-9
+    print('Fractional costs: successive shortest paths terminated on 300 random graphs')
+
 
 
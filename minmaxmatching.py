@@ -1,41 +1,54 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+import time
+from solutionExtraction import selectedKeys
 
-def solveMinMaxMatching(G: nx.Graph) -> list:
+def buildMinMaxMatching(G: nx.Graph):
     """
-    Solves the minimum maximal matching problem.
+    Builds the minimum maximal matching model from the incident-edge lists of G in O(m * max degree).
     :param G: undirected graph
-    :return: List of edges
+    :return: Model, dict of edge variables
     """
     minmaxMatching = Model(name='minmaxMatching')
 
     # Edge variables
     X = {}
+    incident = {u: [] for u in G.nodes()}
     for u,v in G.edges():
         X[u,v] = minmaxMatching.addVar(vtype=GRB.BINARY, name=f'X_{u}_{v}')
+        incident[u].append((v, X[u,v]))
+        incident[v].append((u, X[u,v]))
 
     # Objective functions
-    minmaxMatching.setObjective(quicksum(X[u, v] for u, v in G.edges()), sense=GRB.MINIMIZE)
+    minmaxMatching.setObjective(quicksum(X.values()), sense=GRB.MINIMIZE)
 
     # Constraints
     for u in G.nodes():
-        minmaxMatching.addConstr(quicksum(X[v,w] for v,w in G.edges() if v == u or w == u), GRB.LESS_EQUAL, 1)
+        minmaxMatching.addConstr(quicksum(x for w,x in incident[u]), GRB.LESS_EQUAL, 1)
 
+    # Every edge is in the matching or adjacent to a matched edge (edges incident to u or v other than (u,v))
     for u,v in G.edges():
-        minmaxMatching.addConstr(1-X[u,v], GRB.LESS_EQUAL, quicksum(X[a,b] for a,b in G.edges() if a == u or b == u and not (a,b) == (u,v))
-                                 + quicksum(X[a,b] for a,b in G.edges() if a == v or b == v and not (a,b) == (v,u)))
+        minmaxMatching.addConstr(1-X[u,v], GRB.LESS_EQUAL, quicksum(x for w,x in incident[u] if w != v)
+                                 + quicksum(x for w,x in incident[v] if w != u))
+
+    return minmaxMatching, X
+
+
+def solveMinMaxMatching(G: nx.Graph) -> list:
+    """
+    Solves the minimum maximal matching problem.
+    :param G: undirected graph
+    :return: List of edges
+    """
+    minmaxMatching, X = buildMinMaxMatching(G)
 
     # Solve model
     minmaxMatching.update()
     minmaxMatching.optimize()
 
     if minmaxMatching.status == GRB.OPTIMAL:
-        sol = list()
-        for u,v in G.edges():
-            if round(minmaxMatching.getVarByName(f'X_{u}_{v}').x, 0) == 1:
-                sol.append((u,v))
-        return sol
+        return selectedKeys(minmaxMatching, X)
 
     else:
         return list()
@@ -46,3 +59,11 @@ if __name__ == '__main__':
     G = nx.complete_graph(20)
     solution = solveMinMaxMatching(G)
     print('Minimum maximal matching: {}'.format(solution))
+
+    # Benchmark: Build time against number of edges (complete graphs)
+    for n in [25, 50, 100, 200]:
+        H = nx.complete_graph(n)
+        start = time.perf_counter()
+        model, X = buildMinMaxMatching(H)
+        model.update()
+        print('{} edges: built in {:.2f}s'.format(H.number_of_edges(), time.perf_counter() - start))
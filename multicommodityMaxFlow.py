@@ -1,15 +1,32 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+import numpy as np
+import scipy.sparse as sp
+from solutionExtraction import getValueArray, formatValues
+from flowMatrices import incidenceMatrix, edgeAttributes, supplyVector
+from shortestPath import dijkstra, pathEdges
 
 
-def solveMaximumMulticommodityFlow(G: nx.DiGraph, commodities: dict) -> dict:
+def solveMaximumMulticommodityFlow(G: nx.DiGraph, commodities: dict, output: str = 'dict',
+                                   builder: str = 'quicksum', formulation: str = 'arc') -> dict:
     """
     Solves the multicommodity maximum flow problem.
     :param G: directed graph
     :param commodities: Dict of source-sink-pairs
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :param builder: String indicating whether the model is built with quicksum expressions ('quicksum') or from the
+    sparse node-arc incidence matrix ('matrix')
+    :param formulation: String indicating whether the arc-commodity formulation ('arc') or the path formulation solved
+    by column generation ('path') is used
     :return: Dict of edges and flow values
     """
+    if formulation == 'path':
+        return solveMaximumMulticommodityFlowPaths(G, commodities, output)
+
+    if builder == 'matrix':
+        return solveMaximumMulticommodityFlowMatrix(G, commodities, output)
+
     multicommodityFlow = Model('MulticommodityFlow')
 
     # Variable
@@ -50,18 +67,133 @@ def solveMaximumMulticommodityFlow(G: nx.DiGraph, commodities: dict) -> dict:
     multicommodityFlow.optimize()
 
     if multicommodityFlow.status == GRB.OPTIMAL:
+        values = getValueArray(multicommodityFlow, X).reshape(len(commodities), G.number_of_edges())
+        edges = list(G.edges())
         flows = dict()
-        for k in commodities:
-            flows[k] = dict()
-            for a in G.edges():
-                if multicommodityFlow.getVarByName(f'X_{a}_{k}').x > 0:
-                    flows[k][a] = multicommodityFlow.getVarByName(f'X_{a}_{k}').x
+        for k, commodityValues in zip(commodities, values):
+            flows[k] = formatValues(edges, commodityValues, output)
         return flows
 
     else:
         return dict()
 
 
+def solveMaximumMulticommodityFlowMatrix(G: nx.DiGraph, commodities: dict, output: str = 'dict') -> dict:
+    """
+    Solves the multicommodity maximum flow problem with a model built from the sparse node-arc incidence matrix. The
+    commodities are stacked as diagonal blocks (Kronecker product with the identity).
+    :param G: directed graph
+    :param commodities: Dict of source-sink-pairs
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :return: Dict of edges and flow values
+    """
+    multicommodityFlow = Model('MulticommodityFlow')
+
+    A, nodeIndex, edges = incidenceMatrix(G)
+    n, m, K = A.shape[0], A.shape[1], len(commodities)
+
+    # Variables: arc flows of all commodities followed by the flow values B
+    capacity = edgeAttributes(G, 'capacity')
+    X = multicommodityFlow.addMVar(K * m + K, lb=0, ub=np.concatenate([np.tile(capacity, K), np.full(K, GRB.INFINITY)]),
+                                   name='X')
+
+    # Objective function
+    c = np.concatenate([np.zeros(K * m), np.ones(K)])
+    multicommodityFlow.setMObjective(None, c, 0, xc=X, sense=GRB.MAXIMIZE)
+
+    # Constraints
+    supplies = sp.csr_matrix(np.column_stack([supplyVector(nodeIndex, *val) for val in commodities.values()]))
+    conservation = sp.hstack([sp.kron(sp.identity(K), A), -sp.block_diag([supplies[:, [k]] for k in range(K)])],
+                             format='csr')
+    multicommodityFlow.addMConstr(conservation, X, GRB.EQUAL, np.zeros(K * n))
+
+    coupling = sp.hstack([sp.kron(np.ones((1, K)), sp.identity(m)), sp.csr_matrix((m, K))], format='csr')
+    multicommodityFlow.addMConstr(coupling, X, GRB.LESS_EQUAL, capacity)
+
+    # Solve model
+    multicommodityFlow.update()
+    multicommodityFlow.optimize()
+
+    if multicommodityFlow.status == GRB.OPTIMAL:
+        values = X.X[:K * m].reshape(K, m)
+        flows = dict()
+        for k, commodityValues in zip(commodities, values):
+            flows[k] = formatValues(edges, commodityValues, output)
+        return flows
+
+    else:
+        return dict()
+
+
+def solveMaximumMulticommodityFlowPaths(G: nx.DiGraph, commodities: dict, output: str = 'dict',
+                                        maxIterations: int = 1000) -> dict:
+    """
+    Solves the multicommodity maximum flow problem with the path formulation by column generation. The restricted
+    master has one capacity row per edge, new paths are priced by shortest path computations on the edge duals.
+    :param G: directed graph
+    :param commodities: Dict of source-sink-pairs
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :param maxIterations: Maximum number of pricing rounds (the last restricted master is used if it is reached)
+    :return: Dict of edges and flow values
+    """
+    master = Model('MulticommodityFlowPaths')
+    master.ModelSense = GRB.MAXIMIZE
+
+    edges = list(G.edges())
+    capacity = {a: G.get_edge_data(*a)['capacity'] for a in edges}
+
+    # Constraints
+    capacityRows = dict()
+    for a in edges:
+        capacityRows[a] = master.addConstr(LinExpr(), GRB.LESS_EQUAL, capacity[a])
+
+    # Path variables
+    P = dict()
+
+    for iteration in range(maxIterations):
+        master.update()
+        master.optimize()
+        if not master.status == GRB.OPTIMAL:
+            return dict()
+
+        # Pricing: shortest paths with respect to the edge duals (edges without capacity are excluded)
+        y = master.getAttr(GRB.Attr.Pi, list(capacityRows.values()))
+        reducedCost = {a: y_a if capacity[a] > 0 else float('inf') for a, y_a in zip(edges, y)}
+
+        newPaths = 0
+        for k, val in commodities.items():
+            distance, predecessor = dijkstra(G, val[0], val[1], weights=reducedCost)
+            if distance.get(val[1], float('inf')) < 1 - 1e-6:
+                path = tuple(pathEdges(predecessor, val[0], val[1]))
+                # A path already in the master can only price out by tolerance noise in the duals
+                if (k, path) in P:
+                    continue
+                P[k, path] = master.addVar(vtype=GRB.CONTINUOUS, lb=0, obj=1,
+                                           column=Column([1] * len(path), [capacityRows[a] for a in path]),
+                                           name=f'P_{k}_{len(P)}')
+                newPaths += 1
+
+        if newPaths == 0:
+            break
+    else:
+        master.update()
+        master.optimize()
+        if not master.status == GRB.OPTIMAL:
+            return dict()
+
+    edgeIndex = {a: i for i, a in enumerate(edges)}
+    values = np.zeros((len(commodities), len(edges)))
+    commodityIndex = {k: i for i, k in enumerate(commodities)}
+    for (k, path), value in zip(P.keys(), master.getAttr(GRB.Attr.X, list(P.values()))):
+        for a in path:
+            values[commodityIndex[k], edgeIndex[a]] += value
+
+    flows = dict()
+    for k, commodityValues in zip(commodities, values):
+        flows[k] = formatValues(edges, commodityValues, output)
+    return flows
+
+
 if __name__ == '__main__':
     # Example: Complete graph on 5 vertices
     G = nx.complete_graph(5).to_directed()
@@ -1,16 +1,35 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from solutionExtraction import getValueArray, formatValues
+from flowMatrices import incidenceMatrix, edgeAttributes, supplyVector
+from shortestPath import dijkstra, pathEdges
+from minCostFlow import successiveShortestPaths
 
 
-def solveMulticommodityMinCostFlow(G: nx.DiGraph, commodities: dict, demands: dict) -> dict:
+def solveMulticommodityMinCostFlow(G: nx.DiGraph, commodities: dict, demands: dict, output: str = 'dict',
+                                   builder: str = 'quicksum', formulation: str = 'arc') -> dict:
     """
     Solves the multicommodity minimum cost flow problem.
     :param G: directed graph
     :param commodities: Dict of source-sink-pairs
     :param demand: Dict of demand values (for each commodity)
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :param builder: String indicating whether the model is built with quicksum expressions ('quicksum') or from the
+    sparse node-arc incidence matrix ('matrix')
+    :param formulation: String indicating whether the arc-commodity formulation ('arc') or the path formulation solved
+    by column generation ('path') is used
     :return: Dict of edges and flow values
     """
+    if formulation == 'path':
+        return solveMulticommodityMinCostFlowPaths(G, commodities, demands, output)
+
+    if builder == 'matrix':
+        return solveMulticommodityMinCostFlowMatrix(G, commodities, demands, output)
+
     multicommodityFlow = Model('multicommodityMinCostFlow')
 
     # Variable
@@ -43,6 +62,10 @@ def solveMulticommodityMinCostFlow(G: nx.DiGraph, commodities: dict, demands: di
                     quicksum(X[a, k] for a in G.out_edges(v)) - quicksum(X[a, k] for a in G.in_edges(v)),
                     GRB.EQUAL, 0)
 
+    for a in G.edges():
+        multicommodityFlow.addConstr(quicksum(X[a, k] for k in commodities), GRB.LESS_EQUAL,
+                                     G.get_edge_data(*a)['capacity'])
+
 
     # Solve model
     multicommodityFlow.update()
@@ -50,12 +73,54 @@ def solveMulticommodityMinCostFlow(G: nx.DiGraph, commodities: dict, demands: di
 
 
     if multicommodityFlow.status == GRB.OPTIMAL:
+        values = getValueArray(multicommodityFlow, X).reshape(len(commodities), G.number_of_edges())
+        edges = list(G.edges())
+        flows = dict()
+        for k, commodityValues in zip(commodities, values):
+            flows[k] = formatValues(edges, commodityValues, output)
+        return flows
+
+    else:
+        return dict()
+
+
+def solveMulticommodityMinCostFlowMatrix(G: nx.DiGraph, commodities: dict, demands: dict, output: str = 'dict') -> dict:
+    """
+    Solves the multicommodity minimum cost flow problem with a model built from the sparse node-arc incidence matrix.
+    The commodities are stacked as diagonal blocks (Kronecker product with the identity).
+    :param G: directed graph
+    :param commodities: Dict of source-sink-pairs
+    :param demands: Dict of demand values (for each commodity)
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :return: Dict of edges and flow values
+    """
+    multicommodityFlow = Model('multicommodityMinCostFlow')
+
+    A, nodeIndex, edges = incidenceMatrix(G)
+    m, K = A.shape[1], len(commodities)
+
+    # Variable
+    X = multicommodityFlow.addMVar(K * m, lb=0, ub=np.tile(edgeAttributes(G, 'capacity'), K), name='X')
+
+    # Objective function
+    multicommodityFlow.setMObjective(None, np.tile(edgeAttributes(G, 'cost'), K), 0, xc=X, sense=GRB.MINIMIZE)
+
+    # Constraints
+    b = np.concatenate([supplyVector(nodeIndex, *val, demands[k]) for k, val in commodities.items()])
+    multicommodityFlow.addMConstr(sp.kron(sp.identity(K), A, format='csr'), X, GRB.EQUAL, b)
+
+    coupling = sp.kron(np.ones((1, K)), sp.identity(m), format='csr')
+    multicommodityFlow.addMConstr(coupling, X, GRB.LESS_EQUAL, edgeAttributes(G, 'capacity'))
+
+    # Solve model
+    multicommodityFlow.update()
+    multicommodityFlow.optimize()
+
+    if multicommodityFlow.status == GRB.OPTIMAL:
+        values = X.X.reshape(K, m)
         flows = dict()
-        for k in commodities:
-            flows[k] = dict()
-            for a in G.edges():
-                if multicommodityFlow.getVarByName(f'X_{a}_{k}').x > 0:
-                    flows[k][a] = multicommodityFlow.getVarByName(f'X_{a}_{k}').x
+        for k, commodityValues in zip(commodities, values):
+            flows[k] = formatValues(edges, commodityValues, output)
         return flows
 
     else:
@@ -64,6 +129,221 @@ def solveMulticommodityMinCostFlow(G: nx.DiGraph, commodities: dict, demands: di
 
 
 
+def solveMulticommodityMinCostFlowPaths(G: nx.DiGraph, commodities: dict, demands: dict, output: str = 'dict',
+                                        maxIterations: int = 1000) -> dict:
+    """
+    Solves the multicommodity minimum cost flow problem with the path formulation by column generation. The
+    restricted master has one demand row per commodity and one capacity row per edge, new paths are priced by
+    shortest path computations on the reduced edge costs. Edge costs must be nonnegative.
+    :param G: directed graph
+    :param commodities: Dict of source-sink-pairs
+    :param demands: Dict of demand values (for each commodity)
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :param maxIterations: Maximum number of pricing rounds (the last restricted master is used if it is reached)
+    :return: Dict of edges and flow values
+    """
+    master = Model('multicommodityMinCostFlowPaths')
+
+    edges = list(G.edges())
+    cost = {a: G.get_edge_data(*a)['cost'] for a in edges}
+
+    # Artificial variables (cost exceeding that of any simple path) keep the restricted master feasible
+    M = sum(cost.values()) + 1
+    Artificial = dict()
+    for k in commodities:
+        Artificial[k] = master.addVar(vtype=GRB.CONTINUOUS, lb=0, obj=M, name=f'Artificial_{k}')
+    master.ModelSense = GRB.MINIMIZE
+
+    # Constraints
+    demandRows = dict()
+    capacityRows = dict()
+    for k in commodities:
+        demandRows[k] = master.addConstr(Artificial[k], GRB.EQUAL, demands[k])
+    for a in edges:
+        capacityRows[a] = master.addConstr(LinExpr(), GRB.LESS_EQUAL, G.get_edge_data(*a)['capacity'])
+
+    # Path variables
+    P = dict()
+
+    for iteration in range(maxIterations):
+        master.update()
+        master.optimize()
+        if not master.status == GRB.OPTIMAL:
+            return dict()
+
+        # Pricing: shortest paths with respect to the reduced edge costs
+        pi = dict(zip(commodities, master.getAttr(GRB.Attr.Pi, list(demandRows.values()))))
+        y = master.getAttr(GRB.Attr.Pi, list(capacityRows.values()))
+        reducedCost = {a: cost[a] - y_a for a, y_a in zip(edges, y)}
+
+        newPaths = 0
+        for k, val in commodities.items():
+            distance, predecessor = dijkstra(G, val[0], val[1], weights=reducedCost)
+            if distance.get(val[1], float('inf')) < pi[k] - 1e-6:
+                path = tuple(pathEdges(predecessor, val[0], val[1]))
+                # A path already in the master can only price out by tolerance noise in the duals
+                if (k, path) in P:
+                    continue
+                P[k, path] = master.addVar(vtype=GRB.CONTINUOUS, lb=0, obj=sum(cost[a] for a in path),
+                                           column=Column([1] * (len(path) + 1),
+                                                         [demandRows[k]] + [capacityRows[a] for a in path]),
+                                           name=f'P_{k}_{len(P)}')
+                newPaths += 1
+
+        if newPaths == 0:
+            break
+    else:
+        master.update()
+        master.optimize()
+        if not master.status == GRB.OPTIMAL:
+            return dict()
+
+    if any(Artificial[k].x > 1e-9 for k in commodities):
+        return dict()
+
+    edgeIndex = {a: i for i, a in enumerate(edges)}
+    values = np.zeros((len(commodities), len(edges)))
+    commodityIndex = {k: i for i, k in enumerate(commodities)}
+    for (k, path), value in zip(P.keys(), master.getAttr(GRB.Attr.X, list(P.values()))):
+        for a in path:
+            values[commodityIndex[k], edgeIndex[a]] += value
+
+    flows = dict()
+    for k, commodityValues in zip(commodities, values):
+        flows[k] = formatValues(edges, commodityValues, output)
+    return flows
+
+
+subproblemGraph = None
+
+
+def initSubproblemWorker(G: nx.DiGraph):
+    """
+    Stores the graph in a worker process so that it is transferred only once.
+    :param G: directed graph
+    """
+    global subproblemGraph
+    subproblemGraph = G
+
+
+def solveSubproblem(task: tuple) -> list:
+    """
+    Solves the single-commodity minimum cost flow subproblem of the Lagrangian relaxation in a worker process.
+    :param task: Tuple of source, sink, demand and list of Lagrangian edge costs
+    :return: List of flow values (in the edge order of the graph) or None if the demand cannot be routed
+    """
+    source, sink, demand, costs = task
+    return successiveShortestPaths(subproblemGraph, source, sink, demand, costs)
+
+
+def solveMulticommodityMinCostFlowLagrangian(G: nx.DiGraph, commodities: dict, demands: dict, output: str = 'dict',
+                                             iterations: int = 100, processes: int = None):
+    """
+    Solves the multicommodity minimum cost flow problem by Lagrangian relaxation of the shared capacity constraints.
+    The multipliers are updated by subgradient optimization, the single-commodity subproblems are solved in parallel
+    in a process pool. Primal solutions are recovered by routing the commodities one after another on the residual
+    capacities with the Lagrangian costs. Edge costs must be nonnegative.
+    :param G: directed graph
+    :param commodities: Dict of source-sink-pairs
+    :param demands: Dict of demand values (for each commodity)
+    :param output: Output format of the flows ('dict', 'array' or 'sparse'), see solutionExtraction.formatValues
+    :param iterations: Maximum number of subgradient iterations
+    :param processes: Number of worker processes (default: number of CPUs)
+    :return: Dict of edges and flow values of the best recovered solution, Lagrangian lower bound and relative
+    duality gap; (None, None, None) if the instance is infeasible. If no solution could be recovered, the flows are
+    those of the arc formulation (solved with Gurobi).
+    """
+    edges = list(G.edges())
+    cost = edgeAttributes(G, 'cost')
+    capacity = edgeAttributes(G, 'capacity')
+
+    multipliers = np.zeros(len(edges))
+    lowerBound = -float('inf')
+    upperBound = float('inf')
+    bestFlows = None
+    stepSize = 2.0
+    noImprovement = 0
+
+    with ProcessPoolExecutor(processes, initializer=initSubproblemWorker, initargs=(G,)) as executor:
+        for iteration in range(iterations):
+            lagrangianCost = cost + multipliers
+            tasks = [(val[0], val[1], demands[k], lagrangianCost.tolist()) for k, val in commodities.items()]
+            results = list(executor.map(solveSubproblem, tasks))
+            if any(result is None for result in results):
+                # Some commodity cannot be routed even without the other commodities
+                return None, None, None
+
+            X = np.array(results, dtype=float)
+            value = float(np.sum(X @ lagrangianCost) - multipliers @ capacity)
+            if value > lowerBound + 1e-9:
+                lowerBound = value
+                noImprovement = 0
+            else:
+                noImprovement += 1
+                if noImprovement >= 5:
+                    stepSize /= 2
+                    noImprovement = 0
+
+            # Primal recovery
+            subgradient = X.sum(axis=0) - capacity
+            if np.all(subgradient <= 1e-9):
+                candidate = X
+            else:
+                candidate = recoverPrimal(G, commodities, demands, capacity, lagrangianCost)
+            if candidate is not None and float(np.sum(candidate @ cost)) < upperBound:
+                upperBound = float(np.sum(candidate @ cost))
+                bestFlows = candidate
+
+            if upperBound - lowerBound <= 1e-6 * max(1.0, abs(upperBound)):
+                break
+
+            # Subgradient step (Polyak step size)
+            subgradient[(multipliers <= 0) & (subgradient < 0)] = 0
+            norm = float(subgradient @ subgradient)
+            if norm == 0:
+                break
+            target = upperBound if upperBound < float('inf') else value + abs(value) * 0.1 + 1
+            multipliers = np.maximum(0, multipliers + stepSize * (target - value) / norm * subgradient)
+
+    if bestFlows is None:
+        # The primal recovery failed, the arc formulation decides feasibility and provides the solution
+        exact = solveMulticommodityMinCostFlowMatrix(G, commodities, demands, output='array')
+        if not exact:
+            return None, None, None
+        bestFlows = np.array([exact[k] for k in commodities])
+        upperBound = float(np.sum(bestFlows @ cost))
+        lowerBound = max(lowerBound, upperBound)
+
+    flows = dict()
+    for k, commodityValues in zip(commodities, bestFlows):
+        flows[k] = formatValues(edges, commodityValues, output)
+    gap = (upperBound - lowerBound) / max(1e-9, abs(upperBound))
+    return flows, lowerBound, max(0.0, gap)
+
+
+def recoverPrimal(G: nx.DiGraph, commodities: dict, demands: dict, capacity: np.ndarray, costs: np.ndarray):
+    """
+    Routes the commodities (largest demand first) one after another on the residual capacities.
+    :param G: directed graph
+    :param commodities: Dict of source-sink-pairs
+    :param demands: Dict of demand values (for each commodity)
+    :param capacity: Array of edge capacities
+    :param costs: Array of edge costs used for routing
+    :return: Array of flow values (commodities x edges) or None if some commodity cannot be routed
+    """
+    residual = capacity.copy()
+    X = np.zeros((len(commodities), len(capacity)))
+    commodityIndex = {k: i for i, k in enumerate(commodities)}
+    for k in sorted(commodities, key=lambda k: -demands[k]):
+        flows = successiveShortestPaths(G, commodities[k][0], commodities[k][1], demands[k], costs.tolist(),
+                                        residual.tolist())
+        if flows is None:
+            return None
+        X[commodityIndex[k]] = flows
+        residual -= X[commodityIndex[k]]
+    return X
+
+
 if __name__ == '__main__':
     # Example: Complete graph on 100 vertices
     G = nx.complete_graph(100).to_directed()
@@ -1,15 +1,100 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+import numpy as np
+from solutionExtraction import selectedKeys
+from distanceMatrix import distanceArray
 
-def solvepCenterLocation(G: nx.Graph, p: int, distances: dict) -> list:
+def coverFeasible(cover: np.ndarray, p: int):
+    """
+    Decides whether all customers can be covered by at most p facilities. A greedy cover is tried first, the set
+    cover model is only solved if the greedy heuristic fails.
+    :param cover: Boolean array, cover[u, v] indicates that a facility at v covers customer u
+    :param p: Number of facilities
+    :return: List of facility indices or None if no cover with at most p facilities exists
+    """
+    if not cover.any(axis=1).all():
+        return None
+
+    # Greedy pre-check
+    uncovered = np.ones(cover.shape[0], dtype=bool)
+    facilities = list()
+    while uncovered.any() and len(facilities) < p:
+        v = int(cover[uncovered].sum(axis=0).argmax())
+        facilities.append(v)
+        uncovered &= ~cover[:, v]
+    if not uncovered.any():
+        return facilities
+
+    # Set cover feasibility model
+    radiusCover = Model(name='radiusCover')
+
+    X = dict()
+    for v in range(cover.shape[1]):
+        X[v] = radiusCover.addVar(vtype=GRB.BINARY, name=f'X_{v}')
+
+    radiusCover.setObjective(0)
+
+    radiusCover.addConstr(quicksum(X[v] for v in X), GRB.LESS_EQUAL, p)
+    for u in range(cover.shape[0]):
+        radiusCover.addConstr(quicksum(X[v] for v in np.flatnonzero(cover[u])), GRB.GREATER_EQUAL, 1)
+
+    radiusCover.update()
+    radiusCover.optimize()
+
+    if radiusCover.status == GRB.OPTIMAL:
+        return selectedKeys(radiusCover, X)
+
+    else:
+        return None
+
+
+def solvepCenterLocationRadius(G: nx.Graph, p: int, distances: dict) -> list:
+    """
+    Solves the p-Center location problem by binary search over the distinct weighted distances. For each radius a
+    set cover feasibility problem decides whether p facilities cover all customers within that radius.
+    :param G: undirected graph
+    :param p: Number of facilities
+    :param distances: Dict of distances or DistanceMatrix
+    :return: List of nodes
+    """
+    nodes = list(G.nodes())
+    demand = np.array([G.nodes[u]['demand'] for u in nodes], dtype=float)
+    weighted = demand[:, None] * distanceArray(distances, nodes)
+
+    # Every customer needs some facility, so the optimal radius is at least the largest nearest weighted distance
+    radii = np.unique(weighted)
+    low = int(np.searchsorted(radii, weighted.min(axis=1).max()))
+    high = len(radii) - 1
+
+    best = coverFeasible(weighted <= radii[high], p)
+    while low < high:
+        middle = (low + high) // 2
+        facilities = coverFeasible(weighted <= radii[middle], p)
+        if facilities is None:
+            low = middle + 1
+        else:
+            high = middle
+            best = facilities
+
+    if best is None:
+        return list()
+    return [nodes[v] for v in best]
+
+
+def solvepCenterLocation(G: nx.Graph, p: int, distances: dict, engine: str = 'gurobi') -> list:
     """
     Solves the p-Center location problem.
     :param G: undirected graph
     :param p: Number of facilities
-    :param distances: Dict of distances
+    :param distances: Dict of distances or DistanceMatrix
+    :param engine: String indicating whether the min-max model is solved with Gurobi ('gurobi') or the binary search
+    over radii with set cover feasibility models is used ('radius')
     :return: List of nodes
     """
+    if engine == 'radius':
+        return solvepCenterLocationRadius(G, p, distances)
+
     pcenterlocation = Model(name='pcenterlocation')
 
     # Location variables
@@ -43,12 +128,7 @@ def solvepCenterLocation(G: nx.Graph, p: int, distances: dict) -> list:
     pcenterlocation.optimize()
 
     if pcenterlocation.status == GRB.OPTIMAL:
-        pcenter = list()
-        for u in G.nodes():
-            if round(pcenterlocation.getVarByName(f'X_{u}').x, 0) == 1:
-                pcenter.append(u)
-
-        return pcenter
+        return selectedKeys(pcenterlocation, X)
 
     else:
         return list()
@@ -1,16 +1,247 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+import numpy as np
+from solutionExtraction import selectedKeys
+from distanceMatrix import distanceArray
 
 
-def solvePMedian(G: nx.Graph, p: int, distances: dict) -> dict:
+def closestFacilities(distances: np.ndarray, facilities: list, chunkSize: int = 1024):
+    """
+    Computes the closest of the given facilities for every customer on chunks of rows.
+    :param distances: Array of distances (customers x facilities)
+    :param facilities: List of facility indices
+    :param chunkSize: Number of rows per chunk
+    :return: Array of positions in facilities and array of distances of the closest facilities
+    """
+    closest = np.empty(distances.shape[0], dtype=np.int64)
+    closestDistances = np.empty(distances.shape[0])
+    for start in range(0, distances.shape[0], chunkSize):
+        rows = np.asarray(distances[start:start + chunkSize, facilities], dtype=float)
+        closest[start:start + len(rows)] = rows.argmin(axis=1)
+        closestDistances[start:start + len(rows)] = rows.min(axis=1)
+
+    return closest, closestDistances
+
+
+def medianCost(distances: np.ndarray, demand: np.ndarray, facilities: list) -> float:
+    """
+    Computes the objective value of a set of facilities (every customer is served by its closest facility).
+    :param distances: Array of distances (customers x facilities)
+    :param demand: Array of demands of the customers
+    :param facilities: List of facility indices
+    :return: Objective value
+    """
+    return float(demand @ closestFacilities(distances, facilities)[1])
+
+
+def nearestCandidates(distances: np.ndarray, K: int, chunkSize: int = 1024):
+    """
+    Computes the K nearest candidate facilities of every customer with np.argpartition on chunks of rows, so that a
+    memory-mapped distance matrix is never loaded completely.
+    :param distances: Array of distances (customers x facilities)
+    :param K: Number of candidates per customer
+    :param chunkSize: Number of rows per chunk
+    :return: Array of candidates sorted by distance, array of their distances (both customers x K) and array of the
+    distances to the next nearest facility (inf if K is the number of facilities)
+    """
+    m, n = distances.shape
+    nearest = np.empty((m, K), dtype=np.int64)
+    nearestDistances = np.empty((m, K))
+    nextDistance = np.full(m, np.inf)
+
+    for start in range(0, m, chunkSize):
+        rows = np.asarray(distances[start:start + chunkSize], dtype=float)
+        candidates = np.argpartition(rows, K, axis=1)[:, :K + 1] if K < n else np.tile(np.arange(n), (len(rows), 1))
+        candidateDistances = np.take_along_axis(rows, candidates, axis=1)
+        order = np.argsort(candidateDistances, axis=1, kind='stable')
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidateDistances = np.take_along_axis(candidateDistances, order, axis=1)
+
+        nearest[start:start + len(rows)] = candidates[:, :K]
+        nearestDistances[start:start + len(rows)] = candidateDistances[:, :K]
+        if K < n:
+            nextDistance[start:start + len(rows)] = candidateDistances[:, K]
+
+    return nearest, nearestDistances, nextDistance
+
+
+def teitzBart(nearest: np.ndarray, nearestCosts: np.ndarray, fallback: np.ndarray, p: int) -> list:
+    """
+    Computes p facilities with the greedy heuristic followed by the vertex substitution (interchange) heuristic of
+    Teitz and Bart. Customers are only served by their nearest candidates, a customer without an open candidate is
+    charged its fallback cost. In each pass the best swap of an open and a closed facility is performed; the swap
+    costs are accumulated over the candidate lists, so a pass takes O(customers x candidates) time and memory.
+    :param nearest: Array of candidate facilities sorted by distance (customers x candidates)
+    :param nearestCosts: Array of demand-weighted distances to the candidates (customers x candidates)
+    :param fallback: Array of costs of the customers without an open candidate
+    :param p: Number of facilities
+    :return: List of facility indices
+    """
+    m, K = nearest.shape
+    n = max(m, int(nearest.max()) + 1)
+    customers = np.arange(m)
+
+    # Greedy
+    facilities = list()
+    current = fallback.copy()
+    for _ in range(p):
+        gains = np.bincount(nearest.ravel(), weights=np.minimum(nearestCosts - current[:, None], 0).ravel(),
+                            minlength=n)
+        gains[facilities] = np.inf
+        j = int(gains.argmin())
+        facilities.append(j)
+        current = np.minimum(current, np.where(nearest == j, nearestCosts, np.inf).min(axis=1))
+
+    # Interchange
+    while True:
+        slot = np.full(n, -1)
+        slot[facilities] = np.arange(p)
+        slots = slot[nearest]
+        rank = np.cumsum(slots >= 0, axis=1)
+        first = np.argmax(rank == 1, axis=1)
+        second = np.argmax(rank == 2, axis=1)
+        served = rank[:, -1] >= 1
+
+        closest = np.where(served, slots[customers, first], -1)
+        best = np.where(served, nearestCosts[customers, first], fallback)
+        secondBest = np.where(rank[:, -1] >= 2, nearestCosts[customers, second], fallback)
+        currentCost = best.sum()
+
+        # Opening j saves gain_j, closing s costs loss_s, the correction covers the customers of s that have j as
+        # candidate: they move to j or to their second best facility
+        gain = np.bincount(nearest.ravel(), weights=np.minimum(nearestCosts - best[:, None], 0).ravel(), minlength=n)
+        loss = np.bincount(closest[served], weights=(secondBest - best)[served], minlength=p)
+        correction = (np.minimum(nearestCosts, secondBest[:, None]) - secondBest[:, None]
+                      - np.minimum(nearestCosts, best[:, None]) + best[:, None])
+        pairs = (correction < 0) & served[:, None]
+        keys, inverse = np.unique(closest[:, None].repeat(K, axis=1)[pairs] * n + nearest[pairs],
+                                  return_inverse=True)
+        s, j = np.divmod(keys, n)
+        values = loss[s] + np.bincount(inverse, weights=correction[pairs], minlength=len(keys))
+
+        # Best facility to close for every facility to open
+        close = np.full(n, int(loss.argmin()))
+        swapCost = np.full(n, loss.min())
+        order = np.lexsort((values, j))
+        j, head = np.unique(j[order], return_index=True)
+        s, values = s[order][head], values[order][head]
+        better = values < swapCost[j]
+        close[j[better]] = s[better]
+        swapCost[j[better]] = values[better]
+
+        costs = gain + swapCost
+        costs[facilities] = np.inf
+        opened = int(costs.argmin())
+        if costs[opened] >= -1e-9 * max(1.0, currentCost):
+            return facilities
+        facilities[close[opened]] = opened
+
+
+def solvePMedianReduced(G: nx.Graph, p: int, distances: dict, candidates: int = 10) -> dict:
+    """
+    Solves the p-Median location problem with the reduced formulation over sorted distance levels (Cornuejols,
+    Nemhauser, Wolsey; Elloumi). Z_v_k indicates that customer v is served at a distance above its k-th distance
+    level. Only the levels of the candidates nearest candidates of each customer are modelled; the remaining
+    distance is charged at the next level, which gives a lower bound. If the resulting facilities are not proven
+    optimal, the number of candidates is doubled. The Teitz-Bart heuristic on the nearest candidates provides the
+    MIP start. The distances are only read row by row, so a DistanceMatrix on disk is never loaded completely.
+    :param G: undirected graph
+    :param p: Number of facilities
+    :param distances: Dict of distances or DistanceMatrix
+    :param candidates: Number of nearest candidates per customer (None: all nodes)
+    :return: Dict of nodes
+    """
+    nodes = list(G.nodes())
+    n = len(nodes)
+    demand = np.array([G.nodes[v]['demand'] for v in nodes], dtype=float)
+    D = distanceArray(distances, nodes)
+
+    facilities = None
+    upperBound = np.inf
+    K = n if candidates is None else min(n, candidates)
+
+    while True:
+        nearest, nearestDistances, nextDistance = nearestCandidates(D, K)
+
+        # Heuristic on the candidates (customers without open candidate are charged the next distance)
+        fallback = demand * np.where(np.isinf(nextDistance), nearestDistances[:, -1], nextDistance)
+        heuristic = teitzBart(nearest, demand[:, None] * nearestDistances, fallback, p)
+        if medianCost(D, demand, heuristic) < upperBound:
+            facilities = heuristic
+            upperBound = medianCost(D, demand, heuristic)
+
+        pMedian = Model('pMedianReduced')
+
+        # Variables
+        Y = dict()
+        Z = dict()
+        start = set(facilities)
+
+        for u in range(n):
+            Y[u] = pMedian.addVar(vtype=GRB.BINARY, name=f'Y_{nodes[u]}')
+            Y[u].Start = 1 if u in start else 0
+
+        objective = LinExpr()
+        for v in range(n):
+            order = nearest[v]
+            levels, first = np.unique(nearestDistances[v], return_index=True)
+            objective += demand[v] * levels[0]
+
+            # Z_v_k >= Z_v_k-1 - sum of facilities at level k (Z_v_0 = 1)
+            previous = 1
+            for k in range(len(levels)):
+                nextLevel = levels[k + 1] if k + 1 < len(levels) else (nextDistance[v] if K < n else None)
+                end = first[k + 1] if k + 1 < len(levels) else K
+                Z[v, k] = pMedian.addVar(vtype=GRB.CONTINUOUS, lb=0, ub=0 if nextLevel is None else 1,
+                                         name=f'Z_{nodes[v]}_{k}')
+                if nextLevel is not None:
+                    objective += demand[v] * (nextLevel - levels[k]) * Z[v, k]
+                pMedian.addConstr(Z[v, k] + quicksum(Y[u] for u in order[first[k]:end]), GRB.GREATER_EQUAL,
+                                  previous)
+                previous = Z[v, k]
+
+        # Objective function
+        pMedian.setObjective(objective, sense=GRB.MINIMIZE)
+
+        # Constraints
+        pMedian.addConstr(quicksum(Y[u] for u in range(n)), GRB.EQUAL, p)
+
+        # Solve model
+        pMedian.update()
+        pMedian.optimize()
+
+        if not pMedian.status == GRB.OPTIMAL:
+            return dict()
+
+        solution = selectedKeys(pMedian, Y)
+        if medianCost(D, demand, solution) < upperBound:
+            facilities = solution
+            upperBound = medianCost(D, demand, solution)
+
+        # Exactness check: the lower bound of the restricted model is attained
+        if K == n or upperBound <= pMedian.objVal + 1e-6 * max(1.0, abs(upperBound)):
+            break
+        K = min(n, 2 * K)
+
+    closest, _ = closestFacilities(D, facilities)
+    return {nodes[v]: nodes[facilities[closest[v]]] for v in range(n)}
+
+
+def solvePMedian(G: nx.Graph, p: int, distances: dict, formulation: str = 'assignment', candidates: int = 10) -> dict:
     """
     Solves the p-Median location problem.
     :param G: undirected graph
     :param p: Number of facilities
-    :param distances: Dict of distances
+    :param distances: Dict of distances or DistanceMatrix
+    :param formulation: String indicating whether the assignment formulation ('assignment') or the reduced formulation
+    over sorted distance levels ('reduced') is used
+    :param candidates: Number of nearest candidates per customer in the reduced formulation (None: all nodes)
     :return: Dict of nodes
     """
+    if formulation == 'reduced':
+        return solvePMedianReduced(G, p, distances, candidates)
+
     pMedian = Model('pMedian')
 
     # Variables
@@ -40,13 +271,7 @@ def solvePMedian(G: nx.Graph, p: int, distances: dict) -> dict:
     pMedian.optimize()
 
     if pMedian.status == GRB.OPTIMAL:
-        assignment = dict()
-        for v in G.nodes():
-            for u in G.nodes():
-                if round(pMedian.getVarByName(f'X_{v}_{u}').x, 0) == 1:
-                    assignment[v] = u
-
-        return assignment
+        return dict(selectedKeys(pMedian, X))
 
     else:
         return dict()
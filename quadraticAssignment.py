@@ -1,17 +1,257 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import linear_sum_assignment
+from solutionExtraction import extractValues, formatValues
 
 
-def solveQuadraticAssignment(facilities: list, locations: list, weights: dict, distances: dict) -> dict:
+def qapArrays(facilities: list, locations: list, weights: dict, distances: dict):
+    """
+    Converts the weight and distance dicts into arrays (in the order of facilities and locations).
+    :param facilities: List of facilities
+    :param locations: List of locations
+    :param weights: Dict of weights between facilities
+    :param distances: Dict of distances between locations
+    :return: Arrays of weights and distances
+    """
+    F = np.array([[weights[a, b] for b in facilities] for a in facilities], dtype=float)
+    D = np.array([[distances[i, j] for j in locations] for i in locations], dtype=float)
+    return F, D
+
+
+def gilmoreLawlerBound(facilities: list, locations: list, weights: dict, distances: dict) -> float:
+    """
+    Computes the Gilmore-Lawler lower bound of the quadratic assignment problem. The cost of assigning facility a to
+    location i is bounded by the scalar product of the remaining distances of i (ascending) and the remaining weights
+    of a (descending); the bound is the optimal value of the resulting linear assignment problem.
+    :param facilities: List of facilities
+    :param locations: List of locations
+    :param weights: Dict of weights between facilities
+    :param distances: Dict of distances between locations
+    :return: Lower bound
+    """
+    F, D = qapArrays(facilities, locations, weights, distances)
+    n = len(locations)
+    offDiagonal = ~np.eye(n, dtype=bool)
+    sortedDistances = np.sort(D[offDiagonal].reshape(n, n - 1), axis=1)
+    sortedWeights = -np.sort(-F[offDiagonal].reshape(n, n - 1), axis=1)
+    L = np.outer(np.diag(D), np.diag(F)) + sortedDistances @ sortedWeights.T
+    rows, columns = linear_sum_assignment(L)
+    return float(L[rows, columns].sum())
+
+
+def solveQuadraticAssignmentMatrix(facilities: list, locations: list, weights: dict, distances: dict,
+                                   formulation: str, start: dict = None) -> dict:
+    """
+    Solves the quadratic assignment problem with models assembled from the weight and distance matrices. The variable
+    X_i_a (location i, facility a) has index i * n + a, so the objective matrix is the Kronecker product of the
+    distance and the weight matrix.
+    :param facilities: List of facilities
+    :param locations: List of locations
+    :param weights: Dict of weights between facilities
+    :param distances: Dict of distances between locations
+    :param formulation: 'matrix' (quadratic objective), 'kb' (Kaufman-Broeckx linearization) or 'rlt1' (Adams-Johnson
+    level-1 reformulation-linearization)
+    :param start: Optional dict of assignments used as MIP start
+    :return: Dict of assignments
+    """
+    quadrarticAssignment = Model('QAP')
+
+    F, D = qapArrays(facilities, locations, weights, distances)
+    n = len(locations)
+    C = sp.kron(sp.csr_matrix(D), sp.csr_matrix(F), format='csr')
+
+    # Assignment constraints (each location and each facility exactly once)
+    assignment = sp.vstack([sp.kron(sp.identity(n), np.ones((1, n))), sp.kron(np.ones((1, n)), sp.identity(n))],
+                           format='csr')
+
+    if formulation == 'matrix':
+        X = quadrarticAssignment.addMVar(n * n, vtype=GRB.BINARY, name='X')
+        quadrarticAssignment.setMObjective(C, None, 0, xQ_L=X, xQ_R=X, sense=GRB.MINIMIZE)
+        quadrarticAssignment.addMConstr(assignment, X, GRB.EQUAL, np.ones(2 * n))
+
+    elif formulation == 'kb':
+        # W_i_a = X_i_a * sum_jb c_iajb X_j_b, linearized with e_ia = sum_jb c_iajb
+        e = np.asarray(C.sum(axis=1)).ravel()
+        Z = quadrarticAssignment.addMVar(2 * n * n, lb=0, vtype=[GRB.BINARY] * (n * n) + [GRB.CONTINUOUS] * (n * n),
+                                         name='Z')
+        X = Z[:n * n]
+        quadrarticAssignment.setMObjective(None, np.concatenate([np.zeros(n * n), np.ones(n * n)]), 0, xc=Z,
+                                           sense=GRB.MINIMIZE)
+        quadrarticAssignment.addMConstr(sp.hstack([C + sp.diags(e), -sp.identity(n * n)], format='csr'), Z,
+                                        GRB.LESS_EQUAL, e)
+        quadrarticAssignment.addMConstr(sp.hstack([assignment, sp.csr_matrix((2 * n, n * n))], format='csr'), Z,
+                                        GRB.EQUAL, np.ones(2 * n))
+
+    else:
+        # Y_pq = X_p * X_q for p = (i, a) < q = (j, b) with i != j and a != b (symmetry is used)
+        I, A, J, B = (index.ravel() for index in np.meshgrid(*[np.arange(n)] * 4, indexing='ij'))
+        p, q = I * n + A, J * n + B
+        keep = (I != J) & (A != B) & (p < q)
+        I, A, J, B, p, q = I[keep], A[keep], J[keep], B[keep], p[keep], q[keep]
+        m = len(p)
+        columns = n * n + np.arange(m)
+
+        # sum_{j != i} Y_(i,a),(j,b) = X_i_a for all b != a and sum_{b != a} Y_(i,a),(j,b) = X_i_a for all j != i
+        rows = np.concatenate([p * n + B, q * n + A, n ** 3 + p * n + J, n ** 3 + q * n + I])
+        linking = sp.csr_matrix((np.ones(4 * m), (rows, np.tile(columns, 4))), shape=(2 * n ** 3, n * n + m))
+        P = np.arange(n * n)
+        linking = linking + sp.csr_matrix((-np.ones(2 * n ** 3), (np.arange(2 * n ** 3), np.tile(np.repeat(P, n), 2))),
+                                          shape=(2 * n ** 3, n * n + m))
+        own = np.arange(n * n * n)
+        valid = np.concatenate([own % n != (own // n) % n, own % n != (own // n) // n])
+        linking = linking[valid]
+
+        Z = quadrarticAssignment.addMVar(n * n + m, lb=0, vtype=[GRB.BINARY] * (n * n) + [GRB.CONTINUOUS] * m,
+                                         name='Z')
+        X = Z[:n * n]
+        c = np.concatenate([np.outer(np.diag(D), np.diag(F)).ravel(), D[I, J] * F[A, B] + D[J, I] * F[B, A]])
+        quadrarticAssignment.setMObjective(None, c, 0, xc=Z, sense=GRB.MINIMIZE)
+        quadrarticAssignment.addMConstr(linking, Z, GRB.EQUAL, np.zeros(linking.shape[0]))
+        quadrarticAssignment.addMConstr(sp.hstack([assignment, sp.csr_matrix((2 * n, m))], format='csr'), Z,
+                                        GRB.EQUAL, np.ones(2 * n))
+
+    if start is not None:
+        X.Start = np.array([start.get((i, a), 0) for i in locations for a in facilities], dtype=float)
+
+    # Solve model
+    quadrarticAssignment.update()
+    quadrarticAssignment.optimize()
+
+    if quadrarticAssignment.status == GRB.OPTIMAL:
+        return formatValues([(i, a) for i in locations for a in facilities], X.X)
+
+    else:
+        return dict()
+
+
+def swapDeltas(F: np.ndarray, Dp: np.ndarray, r: int) -> np.ndarray:
+    """
+    Computes the cost changes of swapping the locations of facility r and every facility s in O(n) per s.
+    :param F: Array of weights between facilities
+    :param Dp: Array of distances between the locations of the facilities (Dp[a, b] = D[pi[a], pi[b]])
+    :param r: Facility
+    :return: Array of cost changes (zero for s = r)
+    """
+    column = ((F[:, [r]] - F) * (Dp - Dp[:, [r]])).sum(axis=0)
+    row = ((F[[r], :] - F) * (Dp - Dp[[r], :])).sum(axis=1)
+
+    # The sums above include k = r and k = s, whose entries move with the swap and are handled separately
+    diagonal = np.diag(F)
+    distanceDiagonal = np.diag(Dp)
+    termR = (F[r, r] - F[r, :]) * (Dp[r, :] - Dp[r, r]) + (F[r, r] - F[:, r]) * (Dp[:, r] - Dp[r, r])
+    termS = (F[:, r] - diagonal) * (distanceDiagonal - Dp[:, r]) + (F[r, :] - diagonal) * (distanceDiagonal - Dp[r, :])
+    delta = (F[r, r] - diagonal) * (distanceDiagonal - Dp[r, r]) + (F[r, :] - F[:, r]) * (Dp[:, r] - Dp[r, :]) \
+        + column + row - termR - termS
+    delta[r] = 0
+    return delta
+
+
+def robustTabuSearch(F: np.ndarray, D: np.ndarray, iterations: int, seed: int):
+    """
+    Robust tabu search of Taillard for the quadratic assignment problem. The assignment is a permutation array
+    (facility a at location pi[a]); the matrix of all swap cost changes is updated in O(1) per entry after each swap
+    (vectorized), only the rows of the two swapped facilities are recomputed in O(n).
+    :param F: Array of weights between facilities
+    :param D: Array of distances between locations
+    :param iterations: Number of iterations
+    :param seed: Random seed
+    :return: Best permutation and its cost
+    """
+    generator = np.random.default_rng(seed)
+    n = len(F)
+    pi = generator.permutation(n)
+    Dp = D[np.ix_(pi, pi)]
+    cost = float((F * Dp).sum())
+    delta = np.array([swapDeltas(F, Dp, r) for r in range(n)])
+
+    bestPi, bestCost = pi.copy(), cost
+    tabu = np.zeros((n, n), dtype=np.int64)
+    upper = np.triu(np.ones((n, n), dtype=bool), 1)
+
+    for iteration in range(1, iterations + 1):
+        # A swap is tabu if both facilities would return to recently left locations (aspiration: new best cost)
+        forbidden = (tabu[np.arange(n)[:, None], pi[None, :]] >= iteration) & \
+                    (tabu[np.arange(n)[None, :], pi[:, None]] >= iteration)
+        allowed = upper & (~forbidden | (cost + delta < bestCost - 1e-9))
+        if not allowed.any():
+            allowed = upper
+        candidates = np.where(allowed, delta, np.inf)
+        r, s = np.unravel_index(int(candidates.argmin()), candidates.shape)
+
+        tenure = int(generator.integers(max(1, int(0.9 * n)), int(1.1 * n) + 2))
+        tabu[r, pi[r]] = iteration + tenure
+        tabu[s, pi[s]] = iteration + tenure
+
+        cost += delta[r, s]
+        pi[r], pi[s] = pi[s], pi[r]
+        Dp[[r, s], :] = Dp[[s, r], :]
+        Dp[:, [r, s]] = Dp[:, [s, r]]
+
+        # O(1) update of all swaps disjoint from (r, s)
+        g = F[:, r] - F[:, s]
+        h = Dp[:, r] - Dp[:, s]
+        g2 = F[r, :] - F[s, :]
+        h2 = Dp[r, :] - Dp[s, :]
+        delta -= np.subtract.outer(g, g) * np.subtract.outer(h, h) + np.subtract.outer(g2, g2) * np.subtract.outer(h2, h2)
+
+        # Full recomputation of the swaps involving r or s
+        for u in (r, s):
+            delta[u, :] = swapDeltas(F, Dp, u)
+            delta[:, u] = delta[u, :]
+
+        if cost < bestCost - 1e-9:
+            bestPi, bestCost = pi.copy(), cost
+
+    return bestPi, float((F * D[np.ix_(bestPi, bestPi)]).sum())
+
+
+def solveQuadraticAssignmentHeuristic(facilities: list, locations: list, weights: dict, distances: dict,
+                                      iterations: int = 1000, restarts: int = 4, processes: int = None,
+                                      seed: int = 0) -> dict:
+    """
+    Solves the quadratic assignment problem heuristically with independent restarts of the robust tabu search
+    across a process pool.
+    :param facilities: List of facilities
+    :param locations: List of locations
+    :param weights: Dict of weights between facilities
+    :param distances: Dict of distances between locations
+    :param iterations: Number of tabu search iterations per restart
+    :param restarts: Number of independent restarts
+    :param processes: Number of worker processes (default: number of CPUs)
+    :param seed: Random seed of the first restart
+    :return: Dict of assignments
+    """
+    F, D = qapArrays(facilities, locations, weights, distances)
+
+    with ProcessPoolExecutor(processes) as executor:
+        results = list(executor.map(robustTabuSearch, [F] * restarts, [D] * restarts, [iterations] * restarts,
+                                    range(seed, seed + restarts)))
+
+    pi, _ = min(results, key=lambda result: result[1])
+    return {(locations[pi[a]], facilities[a]): 1.0 for a in range(len(facilities))}
+
+
+def solveQuadraticAssignment(facilities: list, locations: list, weights: dict, distances: dict,
+                             formulation: str = 'quadratic', start: dict = None) -> dict:
     """
     Solves the quadratic assignment problem.
     :param facilities: List of facilities
     :param locations: List of locations
     :param weights: Dict of weights between facilities
     :param distances: Dict of distances between locations
+    :param formulation: String indicating whether the quadratic model is built with quicksum expressions
+    ('quadratic') or from the weight and distance matrices ('matrix'), or whether the Kaufman-Broeckx ('kb') or the
+    Adams-Johnson ('rlt1') linearization is used
+    :param start: Optional dict of assignments used as MIP start (e.g. from solveQuadraticAssignmentHeuristic)
     :return: Dict of assignments
     """
+    if formulation in ('matrix', 'kb', 'rlt1'):
+        return solveQuadraticAssignmentMatrix(facilities, locations, weights, distances, formulation, start)
+
     quadrarticAssignment = Model('QAP')
 
     # Variable
@@ -21,6 +261,10 @@ def solveQuadraticAssignment(facilities: list, locations: list, weights: dict, d
         for facility in facilities:
             X[location, facility] = quadrarticAssignment.addVar(vtype=GRB.BINARY, name=f'X_{location}_{facility}')
 
+    if start is not None:
+        for key in X:
+            X[key].Start = start.get(key, 0)
+
     # Objective function
     quadrarticAssignment.setObjective(quicksum(quicksum(
         weights[a, b] * quicksum(quicksum(distances[i, j] * X[i, a] * X[j, b] for i in locations) for j in locations)
@@ -38,12 +282,7 @@ def solveQuadraticAssignment(facilities: list, locations: list, weights: dict, d
     quadrarticAssignment.optimize()
 
     if quadrarticAssignment.status == GRB.OPTIMAL:
-        assignment = dict()
-        for i in locations:
-            for j in facilities:
-                if quadrarticAssignment.getVarByName(f'X_{i}_{j}').x > 0:
-                    assignment[i, j] = quadrarticAssignment.getVarByName(f'X_{i}_{j}').x
-        return assignment
+        return extractValues(quadrarticAssignment, X)
 
     else:
         return dict()
@@ -58,9 +297,9 @@ if __name__ == '__main__':
     weights = {(i, j): rd.randint(1, 10) for i in facilities for j in facilities}
     distances = {(i, j): rd.randint(1, 10) for i in locations for j in locations}
 
-    assignment = solveQuadraticAssignment(facilities, locations, weights, distances)
+    start = solveQuadraticAssignmentHeuristic(facilities, locations, weights, distances)
+    assignment = solveQuadraticAssignment(facilities, locations, weights, distances, start=start)
     for key in assignment.keys():
         print(f'Location {key[0]} is assigned to facility {key[1]}')
 
-
-
+    print('Gilmore-Lawler bound: {}'.format(gilmoreLawlerBound(facilities, locations, weights, distances)))
@@ -1,45 +1,248 @@
 from gurobipy import *
+import numpy as np
+import scipy.sparse as sp
 import random as rd
 
 
-def solveSetCover(S: list, C: list) -> list:
+def coverageMatrix(S: list, C: list) -> sp.csr_matrix:
+    """
+    Builds the element-subset incidence matrix from an inverted index of the elements.
+    :param S: List of elements (ground set)
+    :param C: List of lists over elements in S (collection of subsets)
+    :return: Sparse incidence matrix (elements x subsets)
+    """
+    index = {s: r for r, s in enumerate(S)}
+    rows, columns = [], []
+    for i, subset in enumerate(C):
+        for s in set(subset):
+            if s in index:
+                rows.append(index[s])
+                columns.append(i)
+
+    return sp.csr_matrix((np.ones(len(rows)), (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64))),
+                         shape=(len(S), len(C)))
+
+
+def dominatedColumns(A: sp.csr_matrix) -> np.ndarray:
+    """
+    Finds the subsets whose elements are all covered by another single subset (for identical subsets, all but the
+    first). The candidates for a subset are the subsets containing its least frequent element; they are intersected
+    with the subsets containing its other elements (in order of frequency) until only the subset itself is left.
+    :param A: Sparse incidence matrix (elements x subsets)
+    :return: Boolean array of dominated subsets
+    """
+    A = sp.csc_matrix(A)
+    R = sp.csr_matrix(A)
+    sizes = np.diff(A.indptr)
+    frequency = np.diff(R.indptr)
+    dominated = np.zeros(A.shape[1], dtype=bool)
+
+    # Elements of every subset sorted by frequency, subsets containing every element
+    subsetOf = np.repeat(np.arange(A.shape[1]), sizes)
+    byFrequency = A.indices[np.lexsort((frequency[A.indices], subsetOf))].tolist()
+    containing = [set(R.indices[R.indptr[r]:R.indptr[r + 1]].tolist()) for r in range(R.shape[0])]
+    indptr, sizes = A.indptr.tolist(), sizes.tolist()
+
+    for j in range(A.shape[1]):
+        rows = byFrequency[indptr[j]:indptr[j + 1]]
+        if not rows:
+            continue
+        candidates = containing[rows[0]]
+        for r in rows[1:]:
+            candidates = candidates & containing[r]
+            if len(candidates) == 1:
+                break
+        dominated[j] = any(sizes[k] > sizes[j] or k < j for k in candidates if k != j)
+
+    return dominated
+
+
+def reduceSetCover(A: sp.csr_matrix):
+    """
+    Reduces a set cover instance until none of the reductions applies: subsets that are the only cover of an element
+    are forced, duplicate elements (identical rows) are removed and dominated subsets are removed.
+    :param A: Sparse incidence matrix (elements x subsets)
+    :return: Reduced incidence matrix, original indices of its subsets, list of forced subsets (None if infeasible)
+    """
+    columns = np.arange(A.shape[1])
+    forced = []
+
+    while True:
+        A = sp.csr_matrix(A)
+        counts = np.diff(A.indptr)
+        if (counts == 0).any():
+            return None, None, None
+
+        # Forced subsets and the elements they cover
+        single = np.unique(A.indices[A.indptr[:-1][counts == 1]])
+        if len(single) > 0:
+            forced.extend(columns[single].tolist())
+            covered = np.asarray(A[:, single].sum(axis=1)).ravel() > 0
+            keep = np.ones(A.shape[1], dtype=bool)
+            keep[single] = False
+            A = A[~covered][:, keep]
+            columns = columns[keep]
+            continue
+
+        # Duplicate rows
+        _, first = np.unique([A.indices[A.indptr[r]:A.indptr[r + 1]].tobytes() for r in range(A.shape[0])],
+                             return_index=True)
+        duplicates = len(first) < A.shape[0]
+        if duplicates:
+            A = A[np.sort(first)]
+
+        # Dominated subsets
+        dominated = dominatedColumns(A)
+        if dominated.any():
+            A = A[:, ~dominated]
+            columns = columns[~dominated]
+        elif not duplicates:
+            return A, columns, forced
+
+
+def solveSetCover(S: list, C: list, reduce: bool = False) -> list:
     """
     Solves the set cover problem.
     :param S: List of elements (ground set)
     :param C: List of lists over elements in S (collection of subsets)
+    :param reduce: Whether forced subsets, duplicate elements and dominated subsets are reduced before solving
     :return: List of lists.
     """
+    A = coverageMatrix(S, C)
+    columns = np.arange(len(C))
+    forced = []
+
+    if reduce:
+        A, columns, forced = reduceSetCover(A)
+        if A is None:
+            return None
+        if A.shape[0] == 0:
+            return [C[i] for i in sorted(forced)]
+
     setCover = Model('setCover')
 
     # Variable
-    Y = {}
-
-    for i in range(len(C)):
-        Y[i] = setCover.addVar(vtype=GRB.BINARY, name=f'Y_{i}')
+    Y = setCover.addMVar(A.shape[1], vtype=GRB.BINARY, name='Y')
 
     # Objective function
-    setCover.setObjective(quicksum(Y[i] for i in range(len(C))), sense=GRB.MINIMIZE)
+    setCover.setObjective(Y.sum(), sense=GRB.MINIMIZE)
 
     # Constraint
-    for s in S:
-        setCover.addConstr(1, GRB.LESS_EQUAL, quicksum(Y[i] for i in range(len(C)) if s in C[i]))
+    setCover.addMConstr(A, Y, GRB.GREATER_EQUAL, np.ones(A.shape[0]))
 
     # Solve model
     setCover.update()
     setCover.optimize()
 
     if setCover.status == GRB.OPTIMAL:
-        solution = list()
-        for i in range(len(C)):
-            if round(setCover.getVarByName(f'Y_{i}').x, 0) == 1:
-                solution.append(C[i])
-        return solution
+        return [C[i] for i in sorted(forced + columns[np.round(Y.X) == 1].tolist())]
 
     else:
         return None
 
 
 
+def greedyRepair(A: sp.csr_matrix, AT: sp.csr_matrix, x: np.ndarray, C: np.ndarray) -> np.ndarray:
+    """
+    Completes a partial selection to a cover by adding, for every uncovered element, the subset with the smallest
+    Lagrangian cost covering it, and then removes redundant subsets (most expensive first).
+    :param A: Sparse incidence matrix (elements x subsets)
+    :param AT: Transposed incidence matrix
+    :param x: Boolean array of selected subsets
+    :param C: Array of Lagrangian costs
+    :return: Boolean array of selected subsets
+    """
+    x = x.copy()
+    covered = A @ x.astype(float)
+
+    for r in np.flatnonzero(covered == 0):
+        if covered[r] == 0:
+            candidates = A.indices[A.indptr[r]:A.indptr[r + 1]]
+            j = candidates[np.argmin(C[candidates])]
+            x[j] = True
+            covered[AT.indices[AT.indptr[j]:AT.indptr[j + 1]]] += 1
+
+    # Only subsets whose elements are all covered twice can be redundant (coverage never increases below)
+    chosen = np.flatnonzero(x)
+    twice = AT[chosen] @ (covered >= 2).astype(float)
+    chosen = chosen[twice == np.diff(AT.indptr)[chosen]]
+    for j in chosen[np.argsort(-C[chosen], kind='stable')]:
+        rows = AT.indices[AT.indptr[j]:AT.indptr[j + 1]]
+        if (covered[rows] >= 2).all():
+            x[j] = False
+            covered[rows] -= 1
+
+    return x
+
+
+def solveSetCoverLagrangian(S: list, C: list, iterations: int = 1000, reduce: bool = False):
+    """
+    Solves the set cover problem heuristically by Lagrangian relaxation of the covering rows (Beasley): the multipliers
+    are improved by subgradient optimisation, every Lagrangian solution is repaired greedily to a cover and redundant
+    subsets are removed.
+    :param S: List of elements (ground set)
+    :param C: List of lists over elements in S (collection of subsets)
+    :param iterations: Maximum number of subgradient iterations
+    :param reduce: Whether forced subsets, duplicate elements and dominated subsets are reduced before solving
+    :return: List of lists and Lagrangian lower bound (None, None if infeasible)
+    """
+    A = coverageMatrix(S, C)
+    columns = np.arange(len(C))
+    forced = []
+
+    if reduce:
+        A, columns, forced = reduceSetCover(A)
+        if A is None:
+            return None, None
+    elif (np.diff(A.indptr) == 0).any():
+        return None, None
+
+    AT = sp.csr_matrix(A.T)
+    cost = np.ones(A.shape[1])
+
+    # Initial multipliers: cheapest cost per covered element among the subsets covering an element
+    ratio = cost / np.maximum(np.diff(AT.indptr), 1)
+    u = np.minimum.reduceat(ratio[A.indices], A.indptr[:-1]) if A.shape[0] > 0 else np.zeros(0)
+
+    best = greedyRepair(A, AT, np.zeros(A.shape[1], dtype=bool), cost)
+    upperBound = cost[best].sum()
+    lowerBound = 0
+    step, stall = 2.0, 0
+
+    for iteration in range(iterations):
+        # Lagrangian costs and solution
+        lagrangianCost = cost - AT @ u
+        x = lagrangianCost < 0
+        bound = u.sum() + lagrangianCost[x].sum()
+
+        if bound > lowerBound + 1e-9:
+            lowerBound, stall = bound, 0
+        else:
+            stall += 1
+            if stall == 30:
+                step, stall = step / 2, 0
+
+        # Primal repair (every 10 iterations, the redundancy removal is sequential)
+        if iteration % 10 == 0:
+            solution = greedyRepair(A, AT, x, lagrangianCost)
+            if cost[solution].sum() < upperBound:
+                best, upperBound = solution, cost[solution].sum()
+
+        # Stop when the cover is optimal (the costs are integral, so the lower bound can be rounded up)
+        if np.ceil(lowerBound - 1e-9) >= upperBound or step < 0.005:
+            break
+
+        # Subgradient step
+        subgradient = 1 - A @ x.astype(float)
+        norm = subgradient @ subgradient
+        if norm == 0:
+            break
+        u = np.maximum(0, u + step * (upperBound - bound) / norm * subgradient)
+
+    return [C[i] for i in sorted(forced + columns[best].tolist())], len(forced) + lowerBound
+
+
+
 
 if __name__ == '__main__':
     # Example: Set of 20 elements, collection C of 25 subsets of S
@@ -53,6 +256,8 @@ if __name__ == '__main__':
         sets = solveSetCover(S, C)
         print('Chosen sets: {}'.format(sets))
 
+        sets, lowerBound = solveSetCoverLagrangian(S, C)
+        print('Lagrangian heuristic: {} sets (lower bound {:.2f})'.format(len(sets), lowerBound))
+
     else:
         print('No feasible solution.')
-
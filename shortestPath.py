@@ -1,15 +1,81 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+import heapq
+from solutionExtraction import selectedKeys
 
-def solveShortestPath(G: nx.DiGraph, source,  sink) -> list:
+def dijkstra(G: nx.DiGraph, source, sink=None, weight: str = 'weight', reverse: bool = False, weights: dict = None):
+    """
+    Computes shortest path distances from source with Dijkstra's algorithm (binary heap). Edge weights must be
+    nonnegative. The search runs on the adjacency dicts of G and node-keyed dicts, so no arrays have to be built for
+    calls with changing weights or an early stop at the sink.
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Optional sink node in G (the search stops as soon as it is settled)
+    :param weight: Name of the edge attribute used as weight
+    :param reverse: If True, distances to source along reversed edges are computed
+    :param weights: Optional dict of edges and weights (replaces the edge attribute)
+    :return: Dict of distances and dict of predecessor edges
+    """
+    adjacency = G.pred if reverse else G.succ
+    distance = {source: 0}
+    predecessor = dict()
+    settled = set()
+    heap = [(0, 0, source)]
+    counter = 1
+
+    while heap:
+        d, _, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        if u == sink:
+            break
+        for v, data in adjacency[u].items():
+            edge = (v, u) if reverse else (u, v)
+            newDistance = d + (data[weight] if weights is None else weights[edge])
+            if v not in settled and newDistance < distance.get(v, float('inf')):
+                distance[v] = newDistance
+                predecessor[v] = edge
+                heapq.heappush(heap, (newDistance, counter, v))
+                counter += 1
+
+    return distance, predecessor
+
+
+def pathEdges(predecessor: dict, source, sink) -> list:
+    """
+    Reconstructs the edges of a path from a dict of predecessor edges.
+    :param predecessor: Dict of predecessor edges (see dijkstra)
+    :param source: Source node
+    :param sink: Sink node
+    :return: List of edges from source to sink
+    """
+    path = list()
+    v = sink
+    while v != source:
+        path.append(predecessor[v])
+        v = predecessor[v][0]
+    path.reverse()
+    return path
+
+
+def solveShortestPath(G: nx.DiGraph, source,  sink, engine: str = 'gurobi') -> list:
     """
     Solves the shortest path problem.
     :param G: directed graph
     :param source: Source node in G
     :param sink: Sink node in G
+    :param engine: String indicating whether the binary program is solved with Gurobi ('gurobi') or Dijkstra's
+    algorithm is used ('dijkstra')
     :return: List of edges
     """
+    if engine == 'dijkstra':
+        distance, predecessor = dijkstra(G, source, sink)
+        if sink not in distance:
+            return list()
+        return pathEdges(predecessor, source, sink)
+
     shortestPath = Model('ShortestPath')
 
     # Variable
@@ -38,11 +104,7 @@ def solveShortestPath(G: nx.DiGraph, source,  sink) -> list:
     shortestPath.optimize()
 
     if shortestPath.status == GRB.OPTIMAL:
-        SPedges = list()
-        for a in G.edges():
-            if round(shortestPath.getVarByName(f'X_{a}').x, 0) == 1.0:
-                SPedges.append(a)
-        return SPedges
+        return selectedKeys(shortestPath, X)
 
     else:
         return list()
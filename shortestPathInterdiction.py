@@ -1,16 +1,154 @@
 from gurobipy import *
 import networkx as nx
+import numpy as np
 import random as rd
+from solutionExtraction import selectedKeys
+from shortestPath import dijkstra, pathEdges
+from budgetSweep import sweepBudgets
 
-def solveShortestPathInterdiction(G:nx.DiGraph, interdictionBudget: int, source:int, sink:int) -> list:
+def interdictedShortestPath(G: nx.DiGraph, source, sink, interdicted: list, M: float):
+    """
+    Computes shortest paths with Dijkstra's algorithm after lengthening the interdicted edges by M.
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param interdicted: List of interdicted edges
+    :param M: Length increase of an interdicted edge
+    :return: Dict of distances and dict of predecessor edges
+    """
+    weights = {(u, v): G[u][v]['length'] for u, v in G.edges()}
+    for u, v in interdicted:
+        weights[u, v] += M
+    return dijkstra(G, source, sink, weights=weights)
+
+
+def addPathCut(master: Model, G: nx.DiGraph, Omega: dict, Z: Var, budget: Constr, path: list, M: float):
+    """
+    Adds the covering cut of a path to the master problem and creates the missing interdiction variables of its edges.
+    :param master: Master problem
+    :param G: directed graph
+    :param Omega: Dict of interdiction variables (extended)
+    :param Z: Shortest path length variable
+    :param budget: Budget constraint
+    :param path: List of edges
+    :param M: Length increase of an interdicted edge
+    """
+    for u, v in path:
+        if (u, v) not in Omega:
+            Omega[u, v] = master.addVar(vtype=GRB.BINARY, name=f'Omega_{u}_{v}')
+            master.update()
+            master.chgCoeff(budget, Omega[u, v], G[u][v]['cost'])
+
+    master.addConstr(Z, GRB.LESS_EQUAL, quicksum(G[u][v]['length'] + M * Omega[u, v] for u, v in path))
+
+
+def solveShortestPathInterdictionCuts(G: nx.DiGraph, interdictionBudget: int, source, sink, paths: list = None,
+                                      maxIterations: int = 1000) -> list:
+    """
+    Solves the shortest path network interdiction problem by cut generation (Israeli and Wood): the master problem
+    chooses the interdicted edges, the subproblem computes a shortest path with Dijkstra's algorithm for the current
+    interdiction (interdicted edges are lengthened by M), and every path P adds the covering cut
+    Z <= length(P) + M * sum of Omega over the edges of P.
+    :param G: directed graph
+    :param interdictionBudget: Interdiction budget (int)
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param paths: Optional path cache (list of edge lists), its paths are added as initial cuts and new paths are
+    appended, so it can be reused across solves
+    :param maxIterations: Maximum number of master iterations
+    :return: List of edges
+    """
+    paths = paths if paths is not None else list()
+
+    # Big-M
+    M = sum(G[u][v]['length'] for u,v in G.edges())
+
+    distance, predecessor = dijkstra(G, source, sink, weight='length')
+    if sink not in distance:
+        return list()
+
+    known = {tuple(path) for path in paths}
+    if not paths:
+        paths.append(pathEdges(predecessor, source, sink))
+        known.add(tuple(paths[0]))
+
+    master = Model('shortestPathInterdictionMaster')
+
+    # Variables (interdicting an edge on none of the paths does not change any cut, so Omega is only created for
+    # edges of cached paths)
+    Omega = dict()
+    Z = master.addVar(vtype=GRB.CONTINUOUS, name='Z')
+
+    # Objective function
+    master.setObjective(Z, sense=GRB.MAXIMIZE)
+
+    # Constraints
+    budget = master.addConstr(LinExpr(), GRB.LESS_EQUAL, interdictionBudget)
+
+    for path in paths:
+        addPathCut(master, G, Omega, Z, budget, path, M)
+
+    best, interdiction = -1, list()
+    for iteration in range(maxIterations):
+        # Solve master problem
+        master.update()
+        master.optimize()
+        if master.status != GRB.OPTIMAL:
+            break
+        interdicted = selectedKeys(master, Omega)
+
+        # Subproblem: shortest path for the current interdiction
+        distance, predecessor = interdictedShortestPath(G, source, sink, interdicted, M)
+
+        if distance[sink] > best:
+            best, interdiction = distance[sink], interdicted
+
+        path = pathEdges(predecessor, source, sink)
+        if master.ObjVal <= best + 1e-6 or tuple(path) in known:
+            break
+
+        paths.append(path)
+        known.add(tuple(path))
+        addPathCut(master, G, Omega, Z, budget, path, M)
+
+    return interdiction
+
+
+def solveShortestPathInterdiction(G:nx.DiGraph, interdictionBudget: int, source:int, sink:int,
+                                  engine: str = 'gurobi') -> list:
     """
     Solves the shortest path network interdiction problem.
     :param G: directed graph
     :param interdictionBudget: Interdiction budget (int)
     :param source: Source node in G
     :param sink: Sink node in G
+    :param engine: 'gurobi' (dualized inner problem) or 'cuts' (cut generation with a Dijkstra subproblem)
     :return: List of edges
     """
+    if engine == 'cuts':
+        return solveShortestPathInterdictionCuts(G, interdictionBudget, source, sink)
+
+    shortestPathInterdiction, Omega, budget = buildShortestPathInterdiction(G, interdictionBudget, source, sink)
+
+    # Solve model
+    shortestPathInterdiction.update()
+    shortestPathInterdiction.optimize()
+
+    if shortestPathInterdiction.status == GRB.OPTIMAL:
+        return selectedKeys(shortestPathInterdiction, Omega)
+    else:
+        return list()
+
+
+def buildShortestPathInterdiction(G: nx.DiGraph, interdictionBudget: int, source, sink):
+    """
+    Builds the shortest path network interdiction model (dualized inner problem).
+    :param G: directed graph
+    :param interdictionBudget: Interdiction budget (int)
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :return: Model, dict of interdiction variables, budget constraint
+    """
     shortestPathInterdiction = Model('shortestPathInterdiction')
 
     # Variables
@@ -36,8 +174,8 @@ def solveShortestPathInterdiction(G:nx.DiGraph, interdictionBudget: int, source:
                                           sense=GRB.MAXIMIZE)
 
     # Constraints
-    shortestPathInterdiction.addConstr(quicksum(Omega[u, v] * G[u][v]['cost'] for u, v in G.edges()), GRB.LESS_EQUAL,
-                                       interdictionBudget)
+    budget = shortestPathInterdiction.addConstr(quicksum(Omega[u, v] * G[u][v]['cost'] for u, v in G.edges()),
+                                                GRB.LESS_EQUAL, interdictionBudget)
 
     for u,v in G.edges():
         shortestPathInterdiction.addConstr(Pi[v] - Pi[u] + Y[u,v], GRB.LESS_EQUAL, G[u][v]['length'])
@@ -45,18 +183,52 @@ def solveShortestPathInterdiction(G:nx.DiGraph, interdictionBudget: int, source:
 
     shortestPathInterdiction.addConstr(Pi[source], GRB.EQUAL, 0)
 
-    # Solve model
-    shortestPathInterdiction.update()
-    shortestPathInterdiction.optimize()
+    return shortestPathInterdiction, Omega, budget
 
-    if shortestPathInterdiction.status == GRB.OPTIMAL:
-        interdictedEdges = list()
-        for u,v in G.edges():
-            if round(shortestPathInterdiction.getVarByName(f'Omega_{u}_{v}').x, 0) == 1:
-                interdictedEdges.append((u,v))
-        return interdictedEdges
-    else:
-        return list()
+
+def sweepShortestPathInterdictionCuts(G: nx.DiGraph, budgets: list, source, sink) -> list:
+    """
+    Solves the shortest path network interdiction problem by cut generation for an ascending range of budgets, the path
+    cache is shared between the budgets.
+    :param G: directed graph
+    :param budgets: Ascending list of interdiction budgets
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :return: List of shortest path lengths, list of lists of interdicted edges
+    """
+    M = sum(G[u][v]['length'] for u,v in G.edges())
+    paths = list()
+
+    lengths, interdictions = [], []
+    for budget in budgets:
+        interdicted = solveShortestPathInterdictionCuts(G, budget, source, sink, paths)
+        distance, predecessor = interdictedShortestPath(G, source, sink, interdicted, M)
+        lengths.append(distance.get(sink, np.nan))
+        interdictions.append(interdicted)
+
+    return lengths, interdictions
+
+
+def sweepShortestPathInterdiction(G: nx.DiGraph, budgets: list, source, sink, processes: int = 1,
+                                  engine: str = 'gurobi'):
+    """
+    Solves the shortest path network interdiction problem for a range of budgets (trade-off curve). With 'gurobi', the
+    model is built once per worker and only the budget is changed (see budgetSweep.sweepBudgets); with 'cuts', the
+    budgets are solved by cut generation in ascending order sharing one path cache.
+    :param G: directed graph
+    :param budgets: List of interdiction budgets
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param processes: Number of worker processes (contiguous budget ranges, 'gurobi' only)
+    :param engine: 'gurobi' (dualized inner problem) or 'cuts' (cut generation with a Dijkstra subproblem)
+    :return: Array of budgets (ascending), array of shortest path lengths, list of lists of interdicted edges
+    """
+    if engine == 'cuts':
+        budgets = np.sort(np.asarray(budgets))
+        lengths, interdictions = sweepShortestPathInterdictionCuts(G, budgets.tolist(), source, sink)
+        return budgets, np.array(lengths, dtype=float), interdictions
+
+    return sweepBudgets(buildShortestPathInterdiction, G, budgets, source, sink, processes)
 
 
 if __name__ == '__main__':
@@ -74,3 +246,11 @@ if __name__ == '__main__':
 
     interdictedEdges = solveShortestPathInterdiction(H, interdictionBudget, source, sink)
     print('Interdicted edges: {}'.format(interdictedEdges))
+
+    interdictedEdges = solveShortestPathInterdiction(H, interdictionBudget, source, sink, engine='cuts')
+    print('Interdicted edges (cut generation): {}'.format(interdictedEdges))
+
+    budgets, lengths, interdictions = sweepShortestPathInterdiction(H, list(range(0, 51, 5)), source, sink,
+                                                                    engine='cuts')
+    for budget, length in zip(budgets, lengths):
+        print('Budget {}: shortest path length {}'.format(budget, length))
@@ -0,0 +1,80 @@
+from gurobipy import *
+import numpy as np
+
+
+class SparseValues:
+    """
+    Columnar storage of the nonzero values of a dict of variables. index holds the positions of the nonzero entries
+    in the key order of the dict, values the corresponding solution values.
+    """
+
+    def __init__(self, keys: list, index: np.ndarray, values: np.ndarray):
+        self.keys = keys
+        self.index = index
+        self.values = values
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(zip((self.keys[i] for i in self.index), self.values.tolist()))
+
+    def toDict(self) -> dict:
+        """
+        Converts the nonzero values into a dict of keys and values.
+        :return: Dict of keys and values
+        """
+        return dict(self)
+
+
+def getValueArray(model: Model, variables) -> np.ndarray:
+    """
+    Fetches the solution values of all variables with a single attribute query.
+    :param model: Solved model
+    :param variables: Dict or list of variables
+    :return: Array of solution values (in key order of the dict)
+    """
+    if isinstance(variables, dict):
+        variables = list(variables.values())
+    return np.array(model.getAttr(GRB.Attr.X, variables), dtype=float)
+
+
+def formatValues(keys: list, values: np.ndarray, output: str = 'dict'):
+    """
+    Converts an array of solution values into the requested output format.
+    :param keys: List of keys corresponding to the entries of values
+    :param values: Array of solution values
+    :param output: String indicating whether a dict of positive values ('dict'), the dense array ('array') or the
+    positive values in columnar form ('sparse') should be returned
+    :return: Solution values in the requested format
+    """
+    if output == 'array':
+        return values
+
+    index = np.flatnonzero(values > 0)
+    if output == 'sparse':
+        return SparseValues(keys, index, values[index])
+
+    return dict(zip((keys[i] for i in index), values[index].tolist()))
+
+
+def extractValues(model: Model, variables: dict, output: str = 'dict'):
+    """
+    Extracts the positive solution values of a dict of variables.
+    :param model: Solved model
+    :param variables: Dict of variables
+    :param output: Output format, see formatValues
+    :return: Solution values in the requested format
+    """
+    return formatValues(list(variables.keys()), getValueArray(model, variables), output)
+
+
+def selectedKeys(model: Model, variables: dict) -> list:
+    """
+    Extracts the keys of all binary variables set to one.
+    :param model: Solved model
+    :param variables: Dict of binary variables
+    :return: List of keys
+    """
+    values = model.getAttr(GRB.Attr.X, list(variables.values()))
+    return [key for key, value in zip(variables.keys(), values) if round(value, 0) == 1]
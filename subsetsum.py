@@ -1,14 +1,99 @@
 from gurobipy import *
+import numpy as np
 import random as rd
+from solutionExtraction import selectedKeys
 
 
-def solveSubsetSum(set: dict, target: int) -> dict:
+def bitsetContains(bitset: int, size: int, t: np.ndarray) -> np.ndarray:
+    """
+    Tests several bits of an integer bitset at once on its byte representation.
+    :param bitset: Integer bitset
+    :param size: Number of bytes of the bitset
+    :param t: Array of bit positions
+    :return: Boolean array
+    """
+    bits = np.frombuffer(bitset.to_bytes(size, 'little'), dtype=np.uint8)
+    return (bits[t >> 3] >> (t & 7)) & 1 == 1
+
+
+def subsetSumBitset(values: list, targets: list, checkpoint: int = None) -> list:
+    """
+    Decides for several targets at once which are reachable as sum of a subset of non-negative integers. The reachable
+    sums are propagated as a Python integer bitset (bit t set if t is reachable) by shift-or. Only every checkpoint-th
+    bitset is stored; the bitsets in between are recomputed block by block during the reconstruction.
+    :param values: List of non-negative integers
+    :param targets: List of targets
+    :param checkpoint: Number of items between stored bitsets (default: square root of the number of items)
+    :return: List of index lists of chosen values (None if a target is not reachable)
+    """
+    n = len(values)
+    checkpoint = checkpoint or max(1, int(n ** 0.5))
+    mask = (1 << (max(targets + [0]) + 1)) - 1
+
+    reach = 1
+    checkpoints = []
+    for i, v in enumerate(values):
+        if i % checkpoint == 0:
+            checkpoints.append(reach)
+        reach = (reach | (reach << v)) & mask
+
+    size = (mask.bit_length() + 7) // 8
+
+    targets = np.array(targets, dtype=np.int64)
+    reachable = targets >= 0
+    reachable[reachable] = bitsetContains(reach, size, targets[reachable])
+    remaining = np.where(reachable, targets, 0)
+    taken = np.zeros((len(targets), n), dtype=bool)
+
+    # Walk back block by block: t is reachable after item i but not before it, so item i is chosen
+    for block in reversed(range(len(checkpoints))):
+        start = block * checkpoint
+        states = [checkpoints[block]]
+        for v in values[start:min(n, start + checkpoint) - 1]:
+            states.append((states[-1] | (states[-1] << v)) & mask)
+        for i in reversed(range(start, min(n, start + checkpoint))):
+            taken[:, i] = reachable & ~bitsetContains(states[i - start], size, remaining)
+            remaining[taken[:, i]] -= values[i]
+
+    return [np.flatnonzero(taken[k]).tolist() if reachable[k] else None for k in range(len(targets))]
+
+
+def solveSubsetSumTargets(set: dict, targets: list) -> dict:
+    """
+    Solves the subset sum problem for several targets in one bitset sweep.
+    :param set: Dict of elements (keys) and integers (values)
+    :param targets: List of target values (int)
+    :return: Dict of targets and dicts of chosen elements (None if not reachable)
+    """
+    keys = list(set.keys())
+
+    # Negative integers are chosen up front, deselecting one adds its absolute value
+    offset = sum(set[a] for a in keys if set[a] < 0)
+    values = [abs(set[a]) for a in keys]
+    chosen = subsetSumBitset(values, [t - offset for t in targets])
+
+    solutions = {}
+    for t, indices in zip(targets, chosen):
+        if indices is None:
+            solutions[t] = None
+        else:
+            flipped = {keys[i] for i in indices}
+            solutions[t] = {a: set[a] for a in keys if (a in flipped) != (set[a] < 0)}
+
+    return solutions
+
+
+def solveSubsetSum(set: dict, target: int, engine: str = 'gurobi') -> dict:
     """
     Solves the subset sum problem.
     :param set: Dict of elements (keys) and integers (values)
     :param target: Target value (int)
+    :param engine: 'gurobi' or 'bitset' (dynamic programming over the reachable sums)
     :return: Dict of elements along with their keys.
     """
+    if engine == 'bitset':
+        return solveSubsetSumTargets(set, [target])[target]
+
     subsetsum = Model('subsetsum')
 
     # Variable
@@ -28,11 +113,7 @@ def solveSubsetSum(set: dict, target: int) -> dict:
     subsetsum.optimize()
 
     if subsetsum.status == GRB.OPTIMAL:
-        solution = dict()
-        for a in set.keys():
-            if round(subsetsum.getVarByName(f'X_{a}').x, 0) == 1:
-                solution[a] = set[a]
-        return solution
+        return {a: set[a] for a in selectedKeys(subsetsum, X)}
 
     else:
         return None
@@ -46,3 +127,7 @@ if __name__ == '__main__':
 
     solution = solveSubsetSum(set, target)
     print('Chosen integers: {}'.format(solution))
+
+    solutions = solveSubsetSumTargets(set, [5, 20, 35, 50])
+    for t, solution in solutions.items():
+        print('Target {}: {}'.format(t, solution))
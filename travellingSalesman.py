@@ -3,14 +3,68 @@ import networkx as nx
 import itertools as it
 import random as rd
 import time
+from solutionExtraction import selectedKeys
+
+
+def subtourElimination(model, where):
+    """
+    Callback separating violated subtour elimination constraints. Integer solutions are checked at MIPSOL and cut off
+    by lazy constraints, fractional solutions of the root node are separated at MIPNODE via minimum cuts.
+    :param model: TSP model with attributes _G and _X
+    :param where: Callback code
+    """
+    G = model._G
+    X = model._X
+
+    if where == GRB.Callback.MIPSOL:
+        values = model.cbGetSolution(model._vars)
+        successor = dict()
+        for (u, v), value in zip(X.keys(), values):
+            if value > 0.5:
+                successor[u] = v
+
+        # Connected components of the incumbent are the cycles given by the successor of each node
+        unvisited = set(G.nodes())
+        while unvisited:
+            currentNode = unvisited.pop()
+            cycle = [currentNode]
+            while successor[currentNode] in unvisited:
+                currentNode = successor[currentNode]
+                unvisited.remove(currentNode)
+                cycle.append(currentNode)
+            if len(cycle) < G.number_of_nodes():
+                model.cbLazy(quicksum(X[u, v] for u in cycle for v in G.successors(u) if v in cycle),
+                             GRB.LESS_EQUAL, len(cycle) - 1)
+
+    elif where == GRB.Callback.MIPNODE:
+        if model.cbGet(GRB.Callback.MIPNODE_STATUS) != GRB.OPTIMAL or model.cbGet(GRB.Callback.MIPNODE_NODCNT) > 0:
+            return
+
+        values = model.cbGetNodeRel(model._vars)
+        support = nx.DiGraph()
+        support.add_nodes_from(G.nodes())
+        for (u, v), value in zip(X.keys(), values):
+            if value > 1e-6:
+                support.add_edge(u, v, capacity=value)
+
+        # For every other node v, S is the sink side (containing the start node) of a minimum v-start cut. The tour
+        # enters and leaves S equally often, so at least one arc must leave S towards v
+        start = list(G.nodes())[0]
+        for v in G.nodes():
+            if v == start:
+                continue
+            cutValue, (_, S) = nx.minimum_cut(support, v, start)
+            if cutValue < 1 - 1e-6:
+                model.cbCut(quicksum(X[u, w] for u in S for w in G.successors(u) if w not in S),
+                            GRB.GREATER_EQUAL, 1)
 
 
 def solveTSP(G: nx.DiGraph, subtour: str) -> list:
     """
     Solves the travelling salesman problem.
     :param G: directed graph
-    :param subtour: String indicating whether classical subtour elimination constraints or Miller-Tucker-Zemlin
-    constraints should be used
+    :param subtour: String indicating whether classical subtour elimination constraints ('classic'), lazily separated
+    subtour elimination constraints ('lazy') or Miller-Tucker-Zemlin constraints ('mtz') should be used
     :return: List of nodes (tour)
     """
     TSP = Model('TSP')
@@ -52,19 +106,25 @@ def solveTSP(G: nx.DiGraph, subtour: str) -> list:
 
     # Solve model
     TSP.update()
-    TSP.optimize()
+
+    # Lazy subtour elimination constraints
+    if subtour == 'lazy':
+        TSP._G = G
+        TSP._X = X
+        TSP._vars = list(X.values())
+        TSP.Params.LazyConstraints = 1
+        TSP.Params.PreCrush = 1
+        TSP.optimize(subtourElimination)
+    else:
+        TSP.optimize()
 
     if TSP.status == GRB.OPTIMAL:
-        i = 1
+        successor = dict(selectedKeys(TSP, X))
         currentNode = list(G.nodes())[0]
         tour = [currentNode]
-        while i < G.number_of_nodes() + 1:
-            for u, v in G.out_edges(currentNode):
-                if round(TSP.getVarByName(f'X_{currentNode}_{v}').x, 0) == 1:
-                    tour.append(v)
-                    currentNode = v
-                    i += 1
-                    break
+        for i in range(G.number_of_nodes()):
+            currentNode = successor[currentNode]
+            tour.append(currentNode)
         return tour
     else:
         return None
@@ -83,9 +143,14 @@ if __name__ == '__main__':
     result = solveTSP(G, 'classic')
     endClassic = time.time()
 
+    startLazy = time.time()
+    resultLazy = solveTSP(G, 'lazy')
+    endLazy = time.time()
+
     startMTZ = time.time()
     resultMTZ = solveTSP(G, 'mtz')
     endMTZ = time.time()
 
     print('\nTSP using subtour elimination constraints\nOptimal tour: {}, Required time: {}\n'.format(result, endClassic-startClassic))
+    print('TSP using lazy subtour elimination constraints\nOptimal tour: {}, Required time: {}\n'.format(resultLazy, endLazy-startLazy))
     print('TSP using Miller-Tucker-Zemlin constraints\nOptimal tour: {}, Required time: {}'.format(resultMTZ, endMTZ-startMTZ))
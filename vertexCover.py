@@ -1,13 +1,180 @@
 from gurobipy import *
 import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import maximum_bipartite_matching
+from concurrent.futures import ProcessPoolExecutor
+from solutionExtraction import selectedKeys
 
 
-def solveVertexCover(G: nx.Graph) -> list:
+def degreeReductions(H: nx.Graph, cover: list, folds: list, queue: list):
+    """
+    Applies the degree-0, degree-1 and degree-2 rules to H in place until none applies to a queued vertex. A degree-2
+    vertex u with non-adjacent neighbours v, w is folded: u, v, w are replaced by a new vertex z adjacent to their
+    neighbourhood (z in the cover means v, w in the cover, otherwise u).
+    :param H: undirected graph (modified)
+    :param cover: List of vertices in the cover (extended)
+    :param folds: List of folds (u, v, w, z) (extended)
+    :param queue: List of vertices to check
+    """
+    while queue:
+        u = queue.pop()
+        if u not in H or H.degree(u) > 2:
+            continue
+
+        neighbours = list(H[u])
+        if len(neighbours) == 0:
+            H.remove_node(u)
+            continue
+
+        if len(neighbours) == 1 or H.has_edge(*neighbours):
+            # The neighbours of a degree-1 vertex or of a vertex in a triangle are in an optimal cover
+            queue.extend(w for v in neighbours for w in H[v])
+            cover.extend(neighbours)
+            H.remove_nodes_from(neighbours + [u])
+            continue
+
+        v, w = neighbours
+        z = ('fold', len(folds))
+        adjacent = (set(H[v]) | set(H[w])) - {u, v, w}
+        H.remove_nodes_from([u, v, w])
+        H.add_edges_from((z, x) for x in adjacent)
+        if not adjacent:
+            H.add_node(z)
+        folds.append((u, v, w, z))
+        queue.append(z)
+        queue.extend(adjacent)
+
+
+def dominationReduction(H: nx.Graph, cover: list) -> list:
+    """
+    Adds every vertex v to the cover that dominates a neighbour u (closed neighbourhood of u contained in that of v).
+    :param H: undirected graph (modified)
+    :param cover: List of vertices in the cover (extended)
+    :return: List of vertices whose degree decreased
+    """
+    changed = []
+    for v in list(H.nodes()):
+        if v not in H:
+            continue
+        neighbourhood = set(H[v])
+        if any(len(H[u]) <= len(neighbourhood) and set(H[u]) - {v} <= neighbourhood for u in H[v]):
+            changed.extend(neighbourhood)
+            cover.append(v)
+            H.remove_node(v)
+    return changed
+
+
+def nemhauserTrotterReduction(H: nx.Graph, cover: list) -> list:
+    """
+    Solves the LP relaxation of the vertex cover problem as minimum vertex cover of the bipartite double cover of H
+    (half-integral solution), which is obtained from a maximum matching by Koenig's theorem. Vertices at 1 are added to
+    the cover, vertices at 0 and 1 are removed; the vertices at 1/2 form the kernel (Nemhauser-Trotter).
+    :param H: undirected graph (modified)
+    :param cover: List of vertices in the cover (extended)
+    :return: List of vertices whose degree decreased
+    """
+    nodes = list(H.nodes())
+    if not nodes:
+        return []
+    A = sp.csr_matrix(nx.to_scipy_sparse_array(H, nodelist=nodes, weight=None, format='csr'))
+    matchLeft = maximum_bipartite_matching(A, perm_type='column')
+    matchRight = np.full(len(nodes), -1)
+    matchRight[matchLeft[matchLeft >= 0]] = np.flatnonzero(matchLeft >= 0)
+
+    # Vertices reachable from unmatched left vertices by alternating paths
+    visitedLeft = matchLeft < 0
+    visitedRight = np.zeros(len(nodes), dtype=bool)
+    queue = list(np.flatnonzero(visitedLeft))
+    while queue:
+        u = queue.pop()
+        for v in A.indices[A.indptr[u]:A.indptr[u + 1]]:
+            if not visitedRight[v]:
+                visitedRight[v] = True
+                w = matchRight[v]
+                if w >= 0 and not visitedLeft[w]:
+                    visitedLeft[w] = True
+                    queue.append(w)
+
+    # Koenig: unvisited left and visited right vertices form a minimum cover, x_v is half the number of copies of v
+    value = (~visitedLeft).astype(int) + visitedRight
+    ones = [nodes[i] for i in np.flatnonzero(value == 2)]
+    removed = ones + [nodes[i] for i in np.flatnonzero(value == 0)]
+    changed = {w for v in removed for w in H[v]} - set(removed)
+
+    cover.extend(ones)
+    H.remove_nodes_from(removed)
+    return list(changed)
+
+
+def kernelizeVertexCover(G: nx.Graph):
+    """
+    Reduces the vertex cover problem by degree-0/1/2 rules, domination and the Nemhauser-Trotter reduction until none
+    applies.
+    :param G: undirected graph
+    :return: Kernel graph, list of vertices in the cover, list of folds
+    """
+    H = G.copy()
+    cover, folds = [], []
+    queue = list(H.nodes())
+
+    while True:
+        degreeReductions(H, cover, folds, queue)
+        queue = dominationReduction(H, cover)
+        if queue:
+            continue
+        queue = nemhauserTrotterReduction(H, cover)
+        if not queue:
+            return H, cover, folds
+
+
+def unfoldVertexCover(cover: list, folds: list) -> list:
+    """
+    Maps a cover of the kernel back to the original graph by undoing the folds in reverse order.
+    :param cover: List of vertices in the cover (including fold vertices)
+    :param folds: List of folds (u, v, w, z)
+    :return: List of nodes
+    """
+    cover = set(cover)
+    for u, v, w, z in reversed(folds):
+        if z in cover:
+            cover.remove(z)
+            cover.update([v, w])
+        else:
+            cover.add(u)
+    return list(cover)
+
+
+def solveVertexCoverKernel(G: nx.Graph, processes: int = None) -> list:
+    """
+    Solves the vertex cover problem on the kernel of G, the connected components of the kernel are solved
+    independently across a process pool.
+    :param G: undirected graph
+    :param processes: Number of worker processes (default: number of CPUs)
+    :return: List of nodes
+    """
+    K, cover, folds = kernelizeVertexCover(G)
+    components = [K.subgraph(component).copy() for component in nx.connected_components(K)]
+
+    if components:
+        with ProcessPoolExecutor(processes) as executor:
+            for componentCover in executor.map(solveVertexCover, components):
+                cover.extend(componentCover)
+
+    return unfoldVertexCover(cover, folds)
+
+
+def solveVertexCover(G: nx.Graph, kernelize: bool = False, processes: int = None) -> list:
     """
     Solves the vertex cover problem.
     :param G: undirected graph
+    :param kernelize: Whether the graph is reduced to a kernel first, whose components are solved in parallel
+    :param processes: Number of worker processes for the kernel components (default: number of CPUs)
     :return: List of nodes
     """
+    if kernelize:
+        return solveVertexCoverKernel(G, processes)
+
     vertexCover = Model('VertexCover')
 
     # Variables
@@ -28,12 +195,7 @@ def solveVertexCover(G: nx.Graph) -> list:
     vertexCover.optimize()
 
     if vertexCover.status == GRB.OPTIMAL:
-        nodesInCover = list()
-        for u in G.nodes():
-            if round(vertexCover.getVarByName(f'X_{u}').x, 0) == 1:
-                nodesInCover.append(u)
-
-        return nodesInCover
+        return selectedKeys(vertexCover, X)
 
     else:
         return list()
@@ -46,4 +208,10 @@ if __name__ == '__main__':
     G = nx.ladder_graph(20)
 
     vertexCover = solveVertexCover(G)
-    print('Cover nodes: {}'.format(vertexCover))
\ No newline at end of file
+    print('Cover nodes: {}'.format(vertexCover))
+
+    # Example: Sparse random graph on 10000 vertices
+    G = nx.gnm_random_graph(10000, 15000, seed=1)
+
+    vertexCover = solveVertexCover(G, kernelize=True)
+    print('Cover size: {}'.format(len(vertexCover)))
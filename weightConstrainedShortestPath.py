@@ -1,17 +1,119 @@
 from gurobipy import *
 import networkx as nx
 import random as rd
+import heapq
+from solutionExtraction import selectedKeys
+from shortestPath import dijkstra, pathEdges
 
 
-def solveWeightConstrainedSP(G: nx.DiGraph, source: int, sink: int, W: int) -> list:
+def reduceGraph(G: nx.DiGraph, source: int, sink: int, W: int):
+    """
+    Deletes all edges (and thereby nodes) that cannot be part of an optimal weight-feasible path. Forward and backward
+    Dijkstra bounds on length and weight are compared with the weight bound W and with the length of a feasible path.
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param W: Weight bound
+    :return: Reduced directed graph or None if no feasible path exists
+    """
+    lengthFrom, lengthPredecessor = dijkstra(G, source, weight='length')
+    weightFrom, weightPredecessor = dijkstra(G, source, weight='weight')
+    lengthTo, _ = dijkstra(G, sink, weight='length', reverse=True)
+    weightTo, _ = dijkstra(G, sink, weight='weight', reverse=True)
+
+    if weightFrom.get(sink, float('inf')) > W:
+        return None
+
+    # Upper bound: the shortest path if it is feasible, otherwise the path of minimum weight
+    shortest = pathEdges(lengthPredecessor, source, sink)
+    if sum(G.edges[a]['weight'] for a in shortest) <= W:
+        upperBound = lengthFrom[sink]
+    else:
+        upperBound = sum(G.edges[a]['length'] for a in pathEdges(weightPredecessor, source, sink))
+
+    H = nx.DiGraph()
+    H.add_nodes_from([source, sink])
+    H.add_edges_from((u, v, data) for u, v, data in G.edges(data=True)
+                     if u in weightFrom and v in weightTo
+                     and weightFrom[u] + data['weight'] + weightTo[v] <= W
+                     and lengthFrom[u] + data['length'] + lengthTo[v] <= upperBound)
+    return H
+
+
+def labelSetting(G: nx.DiGraph, source: int, sink: int, W: int) -> list:
+    """
+    Solves the weight-constrained shortest path problem with a label-setting algorithm. Labels are extracted in order
+    of length plus the remaining shortest length (A*), so the first label settled at the sink is optimal and a label
+    is dominated if its weight does not improve on the last settled label of its node.
+    :param G: directed graph
+    :param source: Source node in G
+    :param sink: Sink node in G
+    :param W: Weight bound
+    :return: List of edges
+    """
+    lengthTo, _ = dijkstra(G, sink, weight='length', reverse=True)
+    weightTo, _ = dijkstra(G, sink, weight='weight', reverse=True)
+    if weightTo.get(source, float('inf')) > W:
+        return None
+
+    # Labels: length, weight, node and parent label
+    length = [0]
+    weight = [0]
+    labelNode = [source]
+    parent = [-1]
+
+    minWeight = dict()
+    heap = [(lengthTo[source], 0)]
+
+    while heap:
+        _, label = heapq.heappop(heap)
+        u = labelNode[label]
+        if weight[label] >= minWeight.get(u, float('inf')):
+            continue
+        minWeight[u] = weight[label]
+
+        if u == sink:
+            path = list()
+            while parent[label] >= 0:
+                path.append((labelNode[parent[label]], labelNode[label]))
+                label = parent[label]
+            path.reverse()
+            return path
+
+        for v, data in G.succ[u].items():
+            newWeight = weight[label] + data['weight']
+            if newWeight + weightTo.get(v, float('inf')) > W or newWeight >= minWeight.get(v, float('inf')):
+                continue
+            length.append(length[label] + data['length'])
+            weight.append(newWeight)
+            labelNode.append(v)
+            parent.append(label)
+            heapq.heappush(heap, (length[-1] + lengthTo[v], len(labelNode) - 1))
+
+    return None
+
+
+def solveWeightConstrainedSP(G: nx.DiGraph, source: int, sink: int, W: int, preprocessing: bool = True,
+                             engine: str = 'gurobi') -> list:
     """
     Solves the weight-constrained shortest path problem.
     :param G: directed graph
     :param source: Source node in G
     :param sink: Sink node in G
     :param W: Weight bound
+    :param preprocessing: If True, edges that cannot be part of an optimal feasible path are deleted first
+    :param engine: String indicating whether the binary program is solved with Gurobi ('gurobi') or the label-setting
+    algorithm is used ('labels')
     :return: List of edges
     """
+    if preprocessing:
+        G = reduceGraph(G, source, sink, W)
+        if G is None:
+            return None
+
+    if engine == 'labels':
+        return labelSetting(G, source, sink, W)
+
     weightConstrainedSP = Model('weightConstrainedSP')
 
     # Variable
@@ -42,11 +144,7 @@ def solveWeightConstrainedSP(G: nx.DiGraph, source: int, sink: int, W: int) -> l
     weightConstrainedSP.optimize()
 
     if weightConstrainedSP.status == GRB.OPTIMAL:
-        SPedges = list()
-        for a in G.edges():
-            if round(weightConstrainedSP.getVarByName(f'X_{a}').x, 0) == 1:
-                SPedges.append(a)
-        return SPedges
+        return selectedKeys(weightConstrainedSP, X)
 
     else:
         return None